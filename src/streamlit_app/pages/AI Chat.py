@@ -1,47 +1,40 @@
-import time
+import asyncio
+from typing import TYPE_CHECKING
 
 import streamlit as st
-from logzero import logger
 
-from supersullytools.llm.agent import ChatAgent
-from supersullytools.llm.agent_tools.duckduckgo import get_ddg_tools
-from supersullytools.llm.trackers import SessionUsageTracking, TopicUsageTracking
-from supersullytools.streamlit.chat_agent_utils import ChatAgentUtils
-from supersullytools.utils.common_init import get_standard_completion_handler
+# the llm modules are imported where they are used, so importing this page module does not pull them in
+if TYPE_CHECKING:
+    from supersullytools.llm.agent import ChatAgent
+    from supersullytools.streamlit.chat_agent_utils import ChatAgentUtils
 
 
-@st.cache_resource
-def get_session_usage_tracker() -> SessionUsageTracking:
-    return SessionUsageTracking()
+@st.fragment
+def _chat_area(agent_utils: "ChatAgentUtils", include_function_calls: bool):
+    asyncio.run(agent_utils.adisplay_chat_and_run_agent(include_function_calls))
 
 
-@st.cache_resource
-def get_agent() -> ChatAgent:
-    tool_profiles = {"all": [] + get_ddg_tools()}
-    return ChatAgent(
-        agent_description="You are a helpful assistant.",
-        logger=logger,
-        completion_handler=get_standard_completion_handler(
-            include_session_tracker=False,
-            extra_trackers=[get_session_usage_tracker()],
-            store_source_tag="supersullytools",
-            topics=["AIChat"],
-        ),
-        tool_profiles=tool_profiles,
-    )
+@st.fragment
+def _render_trackers(agent: "ChatAgent"):
+    from supersullytools.llm.trackers import TopicUsageTracking
+
+    for tracker in agent.completion_handler.completion_tracker.trackers:
+        if isinstance(tracker, TopicUsageTracking):
+            continue
+        st.subheader(tracker.__class__.__name__)
+        tracker.render_completion_cost_as_expander()
 
 
 def main():
+    from supersullytools.streamlit.chat_agent_utils import ChatAgentUtils
+    from supersullytools.streamlit.shared_agents import get_default_agent, get_default_completion_handler
+
     with st.sidebar:
-        model = ChatAgentUtils.select_llm(get_standard_completion_handler(), label="LLM to use")
+        model = ChatAgentUtils.select_llm(get_default_completion_handler(), label="LLM to use")
     st.title("AI Chat Agent Testing")
 
-    def _agent():
-        agent = get_agent()
-        agent.default_completion_model = model
-        return agent
-
-    agent = _agent()
+    agent = get_default_agent()
+    agent.default_completion_model = model
     agent_utils = ChatAgentUtils(agent)
 
     if "image_key" not in st.session_state:
@@ -51,38 +44,32 @@ def main():
     image = st.sidebar.file_uploader("Image", type=["png", "jpg"], key=f"image-upload-{st.session_state.image_key}")
     if image and st.sidebar.button("Add image to msg"):
         st.session_state.image_key += 1
-        st.session_state.upload_images.append(image)
-        time.sleep(0.01)
+        # read the contents now, so nothing downstream depends on the UploadedFile handle after the rerun
+        st.session_state.upload_images.append({"name": image.name, "type": image.type, "data": image.getvalue()})
         st.rerun()
 
     if st.session_state.upload_images:
         with st.sidebar.expander("Pending Images", expanded=True):
-            for image in st.session_state.upload_images:
-                st.image(image)
+            st.image(
+                [x["data"] for x in st.session_state.upload_images],
+                width=120,
+                caption=[f"#{idx}" for idx in range(len(st.session_state.upload_images))],
+            )
 
     chat_msg = st.chat_input()
 
     with st.sidebar.expander("Chat Config", expanded=True):
         include_function_calls = st.sidebar.toggle("Show function calls", True)
 
-    agent_utils.display_chat_and_run_agent(include_function_calls)
+    _chat_area(agent_utils, include_function_calls)
 
     if chat_msg:
         if agent_utils.add_user_message(chat_msg, st.session_state.upload_images):
-            if st.session_state.upload_images:
-                # clearing out the upload_images immediately causes weird IO errors, so
-                # just push to another key and overwrite it later
-                st.session_state.uploaded_images = st.session_state.upload_images
-                st.session_state.upload_images = []
-            time.sleep(0.01)
+            st.session_state.upload_images = []
             st.rerun()
 
     with st.sidebar.container(border=True):
-        for tracker in _agent().completion_handler.completion_tracker.trackers:
-            if isinstance(tracker, TopicUsageTracking):
-                continue
-            st.subheader(tracker.__class__.__name__)
-            tracker.render_completion_cost_as_expander()
+        _render_trackers(agent)
 
 
 if __name__ == "__main__":
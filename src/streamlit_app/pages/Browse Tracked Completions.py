@@ -1,86 +1,126 @@
-from typing import Optional
+import time
+from typing import TYPE_CHECKING, Optional
 
 import streamlit as st
-from logzero import logger
-from simplesingletable import PaginatedList
 
-from supersullytools.llm.agent import ChatAgent
-from supersullytools.llm.agent_tools.duckduckgo import get_ddg_tools
-from supersullytools.llm.trackers import SessionUsageTracking, StoredPromptAndResponse
-from supersullytools.streamlit.chat_agent_utils import display_completion
 from supersullytools.streamlit.paginator import item_paginator
-from supersullytools.utils.common_init import (
-    get_standard_completion_dynamodb_memory,
-    get_standard_completion_handler,
-    get_standard_completion_media_manager,
-)
 from supersullytools.utils.misc import now_with_dt
 
+# the llm / storage modules are imported where they are used, so importing this page module does not pull them in
+if TYPE_CHECKING:
+    from supersullytools.llm.trackers import StoredPromptAndResponse, StoredPromptPreview
+
 st.set_page_config(layout="wide", initial_sidebar_state="collapsed")
 
 
-@st.cache_resource
-def get_session_usage_tracker() -> SessionUsageTracking:
-    return SessionUsageTracking()
+# listing pages are bounded in count and age; they are not persisted because disk-persisted caches ignore ttl
+@st.cache_data(max_entries=50, ttl=600)
+def get_first_page(page_size: int = 25) -> tuple[list["StoredPromptPreview"], Optional[dict]]:
+    from supersullytools.llm.trackers import StoredPromptAndResponse
+    from supersullytools.utils.common_init import get_standard_completion_dynamodb_memory
 
+    return StoredPromptAndResponse.list_previews(get_standard_completion_dynamodb_memory(), results_limit=page_size)
 
-@st.cache_resource
-def get_agent() -> ChatAgent:
-    tool_profiles = {"all": [] + get_ddg_tools()}
-    return ChatAgent(
-        agent_description="You are a helpful assistant.",
-        logger=logger,
-        completion_handler=get_standard_completion_handler(
-            include_session_tracker=False, extra_trackers=[get_session_usage_tracker()]
-        ),
-        tool_profiles=tool_profiles,
-    )
 
+@st.cache_data(max_entries=50, ttl=600)
+def get_next_page(pagination_key: dict, page_size: int = 25) -> tuple[list["StoredPromptPreview"], Optional[dict]]:
+    from supersullytools.llm.trackers import StoredPromptAndResponse
+    from supersullytools.utils.common_init import get_standard_completion_dynamodb_memory
 
-@st.cache_data(persist=True)
-def get_completions(
-    pagination_key: Optional[str] = None, num_result: int = 25
-) -> PaginatedList[StoredPromptAndResponse]:
-    return get_standard_completion_dynamodb_memory().list_type_by_updated_at(
-        StoredPromptAndResponse, results_limit=num_result, pagination_key=pagination_key
+    return StoredPromptAndResponse.list_previews(
+        get_standard_completion_dynamodb_memory(), results_limit=page_size, pagination_key=pagination_key
     )
 
 
-def get_most_recent():
-    return get_standard_completion_dynamodb_memory().list_type_by_updated_at(StoredPromptAndResponse, results_limit=1)
+@st.cache_data(persist=True, max_entries=50)
+def get_completion(resource_id: str) -> "StoredPromptAndResponse":
+    from supersullytools.llm.trackers import StoredPromptAndResponse
+    from supersullytools.utils.common_init import get_standard_completion_dynamodb_memory
+
+    return get_standard_completion_dynamodb_memory().read_existing(resource_id, StoredPromptAndResponse)
+
+
+def get_most_recent() -> list["StoredPromptPreview"]:
+    from supersullytools.llm.trackers import StoredPromptAndResponse
+    from supersullytools.utils.common_init import get_standard_completion_dynamodb_memory
+
+    return StoredPromptAndResponse.list_previews(get_standard_completion_dynamodb_memory(), results_limit=1)[0]
+
+
+@st.cache_data
+def get_completion_titles(ids_and_prompts: tuple[tuple[str, Optional[str], str], ...]) -> list[str]:
+    return [(f"{source_tag}: " if source_tag else "") + prompt_start for _, source_tag, prompt_start in ids_and_prompts]
+
+
+def load_first_page():
+    first_page, next_pagination_key = get_first_page()
+    st.session_state.completions = list(first_page)
+    st.session_state.completions_next_key = next_pagination_key
+
+
+def load_next_page():
+    next_page, next_pagination_key = get_next_page(st.session_state.completions_next_key)
+    st.session_state.completions.extend(next_page)
+    st.session_state.completions_next_key = next_pagination_key
+
+
+def reset_loaded_pages():
+    get_first_page.clear()
+    get_next_page.clear()
+    load_first_page()
 
 
 def main():
-    get_standard_completion_dynamodb_memory()
-    agent = get_agent()
-    now = now_with_dt()
+    from supersullytools.streamlit.chat_agent_utils import display_completion
+    from supersullytools.streamlit.shared_agents import get_tracking_completion_handler
+    from supersullytools.utils.common_init import get_standard_completion_media_manager
+
+    completion_handler = get_tracking_completion_handler()
+    # hold "now" steady for a short while, so relative times don't shift as the user pages through completions
+    if time.monotonic() - st.session_state.get("browse_completions_now_ts", float("-inf")) > 30:
+        st.session_state.browse_completions_now = now_with_dt()
+        st.session_state.browse_completions_now_ts = time.monotonic()
+    now = st.session_state.browse_completions_now
 
-    completions = get_completions()
+    # the loaded completions live in the session; the cached page fetches are only hit on a cold session
+    if "completions" not in st.session_state:
+        load_first_page()
 
     if st.button("Check for new"):
-        if get_most_recent()[0].resource_id != completions[0].resource_id:
+        most_recent = get_most_recent()
+        loaded = st.session_state.completions
+        if most_recent and (not loaded or most_recent[0].resource_id != loaded[0].resource_id):
             st.info("Newer completions available; reloading data")
-            get_completions.clear()
-            completions = get_completions()
+            reset_loaded_pages()
         else:
             st.info("No new completions available")
 
+    # only fetch another page once the paginator has reached the end of what is already loaded
+    current_idx = st.session_state.get("ItemPaginator:Completion#item_num", 0)
+    if current_idx >= len(st.session_state.completions) - 1 and st.session_state.completions_next_key:
+        load_next_page()
+
+    completions = st.session_state.completions
+
     def _display(idx):
-        this_completion = completions[idx]
-        st.write(this_completion.resource_id)
-        st.write(this_completion.source_tag)
-        display_completion(this_completion, now, media_manager=get_standard_completion_media_manager())
+        # the listing only holds previews; the full (compressed) item is read when it is actually shown
+        preview = completions[idx]
+        st.write(preview.resource_id)
+        st.write(preview.source_tag)
+        display_completion(
+            get_completion(preview.resource_id), now, media_manager=get_standard_completion_media_manager()
+        )
 
     item_paginator(
         "Completion",
-        [(f"{x.source_tag}: " if x.source_tag else "") + x.prompt[-1].content[:25] for x in completions],
+        get_completion_titles(tuple((x.resource_id, x.source_tag, x.prompt_preview) for x in completions)),
         item_handler_fn=_display,
         enable_keypress_nav=True,
         display_item_names=True,
     )
 
     with st.sidebar.container(border=True):
-        for tracker in agent.completion_handler.completion_tracker.trackers:
+        for tracker in completion_handler.completion_tracker.trackers:
             st.subheader(tracker.__class__.__name__)
             tracker.render_completion_cost_as_expander()
 
@@ -5,14 +5,31 @@ import streamlit as st
 # Import your GoogleCalendarDataAccess class
 from supersullytools.gcalendar_access import CalendarDataAccessError, GoogleCalendarDataAccess
 
-# Initialize the data access object
+
+# Initialize the data access object once per process; it holds the authenticated API client
 # Update the args below to match your environment (files, default calendar, timezone, etc.)
-calendar_dao = GoogleCalendarDataAccess(
-    credentials_file="local/credentials.json",
-    token_file="local/token.json",
-    default_calendar_id="primary",
-    fallback_timezone="America/Los_Angeles",
-)
+@st.cache_resource
+def get_calendar_dao() -> GoogleCalendarDataAccess:
+    return GoogleCalendarDataAccess(
+        credentials_file="local/credentials.json",
+        token_file="local/token.json",
+        default_calendar_id="primary",
+        fallback_timezone="America/Los_Angeles",
+    )
+
+
+calendar_dao = get_calendar_dao()
+
+
+@st.cache_data(ttl=60)
+def cached_list_calendars():
+    return calendar_dao.list_calendars()
+
+
+@st.cache_data(ttl=30)
+def cached_events_on(d: date):
+    return calendar_dao.get_events_on_date(d)
+
 
 # ------------------------------------------------------------------------------
 # Streamlit Layout / UI
@@ -33,7 +50,7 @@ st.subheader("1. List Calendars")
 
 if st.button("List All Calendars"):
     try:
-        calendars = calendar_dao.list_calendars()
+        calendars = cached_list_calendars()
         if calendars:
             st.write("Found the following calendars:")
             for cal in calendars:
@@ -77,6 +94,7 @@ with st.form("add_event_form"):
                 description=event_description,
                 location=event_location,
             )
+            cached_events_on.clear()
             st.success(f"Event created: {created_event.get('htmlLink')}")
         except CalendarDataAccessError as e:
             st.error(f"Error adding event: {e}")
@@ -89,7 +107,7 @@ st.subheader("3. Fetch Events on a Date")
 fetch_date = st.date_input("Select Date", date.today())
 if st.button("Get Events"):
     try:
-        events = calendar_dao.get_events_on_date(fetch_date)
+        events = cached_events_on(fetch_date)
         if not events:
             st.info("No events found on this date.")
         else:
@@ -125,6 +143,7 @@ with st.form("add_all_day_event_form"):
                 description=event_description,
                 location=event_location,
             )
+            cached_events_on.clear()
             st.success(f"Event created: {created_event.get('htmlLink')}")
         except CalendarDataAccessError as e:
             st.error(f"Error adding event: {e}")
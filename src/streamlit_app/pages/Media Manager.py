@@ -198,13 +198,16 @@ def list_media():
 
 
 for media in list_media():
+    # older media don't record the preview's content type; browsers sniff the actual image format regardless
+    content_type = media.preview_content_type or "image/jpeg"
     if media.preview_encrypted:
         if encryption_key:
-            previews.append(get_preview_image_base64(media.resource_id, encryption_key))
+            previews.append((content_type, get_preview_image_base64(media.resource_id, encryption_key)))
         else:
-            previews.append(base64.b64encode(generate_text_image("Encryption Key Required")).decode("utf-8"))
+            placeholder = base64.b64encode(generate_text_image("Encryption Key Required")).decode("utf-8")
+            previews.append(("image/png", placeholder))
     else:
-        previews.append(get_preview_image_base64(media.resource_id))
+        previews.append((content_type, get_preview_image_base64(media.resource_id)))
 
     media_dict = media.model_dump(
         mode="json",
@@ -215,6 +218,7 @@ for media in list_media():
             "preview_size_bytes",
             "storage_size_bytes",
             "preview_storage_size_bytes",
+            "preview_content_type",
         },
     )
     data.append(media_dict)
@@ -224,7 +228,7 @@ for media in list_media():
 df = pd.DataFrame(data)
 
 # Add a column for the preview images
-df["Preview"] = [f"data:image/jpeg;base64,{preview}" for preview in previews]
+df["Preview"] = [f"data:{content_type};base64,{preview}" for content_type, preview in previews]
 
 # Display the DataFrame with custom column configuration
 selected = st.dataframe(
@@ -14,14 +14,17 @@ def main():
     # A sample template for the user to try out.
     default_template = "Roland turns {age(1990-10-01)} in October {offset_year(0)}"
 
-    # Input field for the user to enter any template string
-    template_str = st.text_input("Enter your template string:", default_template)
+    # Inputs are batched in a form so the page only reruns when Parse is clicked
+    with st.form("reminder_template_form"):
+        # Input field for the user to enter any template string
+        template_str = st.text_input("Enter your template string:", default_template)
 
-    # Date input for picking a 'reference date'—this can be today or any other date
-    reference_date = st.date_input("Choose a reference date:", date.today())
+        # Date input for picking a 'reference date'—this can be today or any other date
+        reference_date = st.date_input("Choose a reference date:", date.today())
 
-    # Button to parse the template
-    if st.button("Parse"):
+        submitted = st.form_submit_button("Parse")
+
+    if submitted:
         rendered = parse_template(template_str, reference_date=reference_date)
         st.markdown("**Parsed Result:**")
         st.markdown(f"> {rendered}")
@@ -1,12 +1,18 @@
+import asyncio
 import datetime
 import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import suppress
 from enum import Enum, auto
+from functools import lru_cache
+from itertools import islice
 from logging import Logger
 from typing import Any, Callable, Literal, Optional, Type, TypeVar
+from zoneinfo import ZoneInfo
 
 import jsonref
-import pytz
 from pydantic import BaseModel, computed_field
 
 from supersullytools.llm.completions import (
@@ -19,6 +25,15 @@ from supersullytools.llm.completions import (
 
 PydanticModel = TypeVar("PydanticModel", bound=BaseModel)
 
+# JSON embedded in prompts is written without whitespace; indentation only costs tokens
+_COMPACT_JSON_SEPARATORS = (",", ":")
+
+# placeholder replies the agent gives to system-only turns; hidden from the displayed chat history
+_AI_SYSTEM_MSGS = frozenset({"CONTINUE", "PASS"})
+
+# a tool call payload runs to its closing tag, or -- if that's missing -- to the next <tool> or the end of the msg
+_TOOL_CALL_RE = re.compile(r"<tool>(.*?)(?:</tool>|(?=<tool>)|\Z)", re.DOTALL)
+
 
 class NoParams(BaseModel):
     pass
@@ -30,17 +45,23 @@ class AgentTool(BaseModel):
     params_model: Type[PydanticModel]
     mechanism: Callable[[PydanticModel], dict | list | str | PydanticModel]
     safe_tool: bool = False
+    # skip validation and build the params with `model_construct`; only for tools whose params need no coercion
+    # or defaults-from-validators, since malformed input then reaches the mechanism as-is
+    trusted_params: bool = False
+
+    def build_params(self, params_dict: dict) -> PydanticModel:
+        if self.trusted_params:
+            return self.params_model.model_construct(**params_dict)
+        return self.params_model.model_validate(params_dict)
 
     def invoke_tool(self, params_dict: dict) -> str:
-        params = self.params_model.model_validate(params_dict)
+        params = self.build_params(params_dict)
         result = self.mechanism(params)
-        match result:
-            case BaseModel():
-                return result.model_dump_json()
-            case str():
-                return result
-            case _:
-                return json.dumps(result, default=str)
+        if isinstance(result, str):
+            return result
+        if isinstance(result, BaseModel):
+            return result.model_dump_json()
+        return json.dumps(result, default=str)
 
 
 class StrEnum(str, Enum):
@@ -65,6 +86,9 @@ class ToolUseModes(StrEnum):
     automatic_unsafe = auto()  # all tools will be automatically called
 
 
+# states in which the agent is waiting on something outside of `run_agent` (or has stopped)
+_IDLE_STATES = frozenset({AgentStates.ready_for_message, AgentStates.awaiting_tool_approval, AgentStates.error})
+
 _CT = TypeVar("_CT", bound=AgentTool)
 
 
@@ -82,7 +106,7 @@ class ToolAndParams(BaseModel):
         return self.tool.invoke_tool(self.params)
 
     def validate_params(self) -> PydanticModel:
-        return self.tool.params_model.model_validate(self.params)
+        return self.tool.build_params(self.params)
 
 
 class MsgVerificationError(RuntimeError):
@@ -110,11 +134,18 @@ class ChatAgent(object):
         init_tools_to_use: Optional[list[str]] = None,
         default_max_response_tokens: int = 1000,
         max_consecutive_tool_calls: int = 4,
+        # maximum number of tool calls from a single turn to run at once in `run_agent` / `arun_agent`; 1 runs them
+        # serially. Above 1 (and always in `arun_agent`) tool mechanisms run on worker threads, so they must be
+        # thread-safe and must not call streamlit (`st.*` needs the script thread's ScriptRunContext)
+        max_parallel_tool_calls: int = 1,
+        # once the chat exceeds this many messages, the oldest are folded into a running summary for the prompt;
+        # None sends the full history every turn
+        max_history_msgs: Optional[int] = None,
     ):
         self.agent_description = agent_description
         self.logger = logger
         self.completion_handler = completion_handler
-        self._tool_profiles = (tool_profiles or {}).copy()
+        self._tool_profiles = tool_profiles.copy() if tool_profiles else {}
         self.tool_use_mode = tool_use_mode
         if initial_tool_profile:
             self.active_tool_profile = initial_tool_profile
@@ -137,15 +168,20 @@ class ChatAgent(object):
         self.chat_history: list[PromptMessage | ImagePromptMessage] = []
         self.reset_history()
         self.current_state = AgentStates.ready_for_message
-        self.local_timezone = pytz.timezone(local_timezone_str)
+        self.local_timezone = ZoneInfo(local_timezone_str)
+        self._local_time_str_cache: tuple[int, str] = (-1, "")
         self.require_reason = require_reason
 
         self._status_msg = "Initialization Complete"
-        self._user_preferences = [x for x in user_preferences] if user_preferences else []
-        self._llm_context = {**initial_llm_context} if initial_llm_context else {}
+        self._user_preferences = list(user_preferences) if user_preferences else []
+        self._llm_context = dict(initial_llm_context) if initial_llm_context else {}
         self.default_max_response_tokens = default_max_response_tokens
         self.max_consecutive_tool_calls = max_consecutive_tool_calls
+        self.max_parallel_tool_calls = max_parallel_tool_calls
         self._current_consecutive_tool_calls = 0
+        self._chat_prefix_cache: Optional[tuple[tuple, list[PromptMessage]]] = None
+        self.max_history_msgs = max_history_msgs
+        self._chat_start_idx = 0
 
         for tool_name in init_tools_to_use or []:
             self.manually_invoke_tool(tool_name, {}, force_pass=True)
@@ -155,14 +191,35 @@ class ChatAgent(object):
 
         self._chat_start_idx = len(self.chat_history)
 
+        # render each profile's tools block up front, so the first response doesn't pay for the schema builds
+        for tools in self._tool_profiles.values():
+            if tools:
+                _render_tools_block(tuple(_tool_cache_key(x) for x in tools))
+
+    @property
+    def active_tool_profile(self) -> Optional[str]:
+        return self._active_tool_profile
+
+    @active_tool_profile.setter
+    def active_tool_profile(self, profile_name: Optional[str]):
+        self._active_tool_profile = profile_name
+        self._rebuild_tool_index()
+
+    def _rebuild_tool_index(self):
+        # name -> tool for the active profile; the first tool wins if a profile repeats a name
+        self._current_tools_by_name: dict[str, _CT] = {}
+        for tool in self._tool_profiles.get(self._active_tool_profile) or []:
+            self._current_tools_by_name.setdefault(tool.name, tool)
+
     def add_tool_to_active_profile(self, tool: AgentTool):
         try:
             self.get_current_tool_by_name(tool.name)
         except ValueError:
             self._tool_profiles[self.active_tool_profile].append(tool)
+            self._rebuild_tool_index()
 
     def replace_user_preferences(self, new_preferences: list[str]):
-        self._user_preferences = [x for x in new_preferences] if new_preferences else []
+        self._user_preferences = list(new_preferences) if new_preferences else []
 
     def add_to_context(self, key, value):
         self._llm_context[key] = value
@@ -183,40 +240,26 @@ class ChatAgent(object):
     def get_chat_history(
         self, include_system_messages: bool = False, include_function_calls: bool = False
     ) -> list[PromptMessage | ImagePromptMessage]:
-        messages = [x.copy() for x in self.chat_history[self._chat_start_idx :]]
-
-        def ai_system_msg(x: PromptMessage):
-            if not x.role == "assistant":
-                return False
-            return x.content in ["CONTINUE", "PASS"]
-
-        if not include_system_messages:
-            if include_function_calls:
-                # leave tool call results in place
-                messages = [
-                    x
-                    for x in messages
-                    if (not x.role == "system" and not ai_system_msg(x)) or "<tool_result>" in x.content
-                ]
-            else:
-                messages = [x for x in messages if not x.role == "system" and not ai_system_msg(x)]
-        if not include_function_calls:
-            for idx, msg in enumerate(messages):
-                msg.content = msg.content.split("<tool>", maxsplit=1)[0]
-                messages[idx] = msg
-        return messages
+        def _include(x: PromptMessage | ImagePromptMessage) -> bool:
+            if include_system_messages:
+                return True
+            if x.role == "system" or (x.role == "assistant" and x.content in _AI_SYSTEM_MSGS):
+                # leave tool call results in place when showing function calls
+                return include_function_calls and self._tool_markers(x)[1]
+            return True
+
+        # filter before copying, so only the messages actually returned are copied
+        if include_function_calls:
+            return [x.model_copy() for x in self.chat_history[self._chat_start_idx :] if _include(x)]
+        return [
+            x.model_copy(update={"content": x.content.partition("<tool>")[0]})
+            for x in self.chat_history[self._chat_start_idx :]
+            if _include(x)
+        ]
 
     @property
     def working(self) -> bool:
-        match self.current_state:
-            case AgentStates.ready_for_message:
-                return False
-            case AgentStates.awaiting_tool_approval:
-                return False
-            case AgentStates.error:
-                return False
-            case _:
-                return True
+        return self.current_state not in _IDLE_STATES
 
     def reset_history(self):
         self.pending_tool_calls = []
@@ -224,6 +267,10 @@ class ChatAgent(object):
         self.applied_tool_calls = []
         self.applied_tool_call_results = []
         self.chat_history: list[PromptMessage | ImagePromptMessage] = []
+        self._history_summary = ""
+        self._history_window_start = 0
+        self._tool_marker_cache: dict[int, tuple[str, bool, bool]] = {}
+        self._verified_tool_calls: Optional[tuple[str, list[dict]]] = None
 
     def run_agent(
         self,
@@ -261,7 +308,8 @@ class ChatAgent(object):
                     )
             case AgentStates.pending_tool_use:
                 self.logger.info("Tool use pending, checking if tool approval is required ")
-                pending_tools = self.get_pending_tool_calls()
+                # only the tools are needed to decide on approval, so skip building ToolAndParams here
+                pending_tools = self.get_pending_tool_calls_lite()
                 if not pending_tools:
                     self.logger.info("No tool use pending, returning ready_for_message state")
                     self.current_state = AgentStates.ready_for_message
@@ -272,11 +320,7 @@ class ChatAgent(object):
                         self.current_state = AgentStates.awaiting_tool_approval
                     case ToolUseModes.automatic_safe_only:
                         self.logger.info('Automatic "safe" tool usage mode, checking for unsafe tools')
-                        any_unsafe_tools = False
-                        for pending_tool in pending_tools:
-                            if not pending_tool.tool.safe_tool:
-                                any_unsafe_tools = True
-                        if any_unsafe_tools:
+                        if any(not tool.safe_tool for _, tool in pending_tools):
                             self.logger.info("Tools include unsafe tool, approval required")
                             self.current_state = AgentStates.awaiting_tool_approval
                         else:
@@ -292,40 +336,91 @@ class ChatAgent(object):
             case AgentStates.using_tools:
                 self.logger.info("Using tools!")
                 self._set_status_msg("Beginning tool use", status_callback_fn)
+                pending_tools = self.get_pending_tool_calls()
                 tools_and_results = []
-                for idx, pending_tool in enumerate(self.get_pending_tool_calls()):
-                    self._set_status_msg(f'Using Tool "{pending_tool.tool.name}"', status_callback_fn)
-                    result = self._handle_tool_usage(pending_tool)
-                    self.applied_tool_calls.append(pending_tool)
-                    self.applied_tool_call_results.append(result)
-                    tools_and_results.append((pending_tool, result))
-
-                msg = "Tool use complete\n"
-                for tool, result in tools_and_results:
-                    msg += f"<tool_used>{tool.tool_name}</tool_used>\n<tool_result>\n{result}\n</tool_result>\n"
-
-                if self._current_consecutive_tool_calls < self.max_consecutive_tool_calls:
-                    msg += (
-                        f"This is consecutive tool call number {self._current_consecutive_tool_calls} "
-                        f"of {self.max_consecutive_tool_calls} max. You may now use more tools or respond to the user. "
-                        "Do not send the tool_result directly; provide relevant information."
-                    )
+                if self.max_parallel_tool_calls > 1 and len(pending_tools) > 1:
+                    tool_names = ", ".join(f'"{x.tool.name}"' for x in pending_tools)
+                    self._set_status_msg(f"Using Tools {tool_names}", status_callback_fn)
+                    with ThreadPoolExecutor(max_workers=min(self.max_parallel_tool_calls, len(pending_tools))) as ex:
+                        # submit everything before collecting any results, so the calls actually overlap
+                        futures = [ex.submit(self._handle_tool_usage, x) for x in pending_tools]
+                        tools_and_results = [(x, future.result()) for x, future in zip(pending_tools, futures)]
                 else:
-                    msg += (
-                        f"This is your final ({self.max_consecutive_tool_calls}) tool call; "
-                        f"you MUST now send a response to the user with no tool calls."
-                    )
-
-                self._add_chat_msg(msg, role="system")
-
-                self.logger.info("Tool use completed, sending results to Agent")
-                self.current_state = AgentStates.received_message
-                self._set_status_msg("Ready to handle tool results", status_callback_fn)
+                    for idx, pending_tool in enumerate(pending_tools):
+                        self._set_status_msg(f'Using Tool "{pending_tool.tool.name}"', status_callback_fn)
+                        result = self._handle_tool_usage(pending_tool)
+                        tools_and_results.append((pending_tool, result))
+                self._complete_tool_use(tools_and_results, status_callback_fn)
             case AgentStates.initializing:
                 pass
             case _:
                 raise ValueError(self.current_state)
 
+    async def arun_agent(
+        self,
+        max_response_tokens: Optional[int] = None,
+        override_model: Optional[CompletionModel | str] = None,
+        status_callback_fn: Optional[Callable[[str], None]] = None,
+    ):
+        """Async variant of `run_agent`.
+
+        When tools are being used, every tool call from the turn is submitted before any result is awaited, so
+        independent calls run concurrently (in worker threads, at most `max_parallel_tool_calls` at a time). Tool
+        mechanisms always run off the calling thread here, so they must be thread-safe and streamlit-free.
+        All other states are handled by `run_agent`.
+        """
+        if self.current_state != AgentStates.using_tools:
+            return self.run_agent(
+                max_response_tokens=max_response_tokens,
+                override_model=override_model,
+                status_callback_fn=status_callback_fn,
+            )
+
+        self.logger.info("Using tools!")
+        self._set_status_msg("Beginning tool use", status_callback_fn)
+        pending_tools = self.get_pending_tool_calls()
+        semaphore = asyncio.Semaphore(self.max_parallel_tool_calls)
+
+        async def _use_tool(pending_tool: ToolAndParams) -> str:
+            async with semaphore:
+                return await asyncio.to_thread(self._handle_tool_usage, pending_tool)
+
+        tool_names = ", ".join(f'"{x.tool.name}"' for x in pending_tools)
+        self._set_status_msg(f"Using Tools {tool_names}", status_callback_fn)
+        results = await asyncio.gather(*[_use_tool(x) for x in pending_tools])
+        self._complete_tool_use(list(zip(pending_tools, results)), status_callback_fn)
+
+    def _complete_tool_use(
+        self,
+        tools_and_results: list[tuple[ToolAndParams, str]],
+        status_callback_fn: Optional[Callable[[str], None]] = None,
+    ):
+        for tool, result in tools_and_results:
+            self.applied_tool_calls.append(tool)
+            self.applied_tool_call_results.append(result)
+
+        msg = "Tool use complete\n"
+        for tool, result in tools_and_results:
+            msg += f"<tool_used>{tool.tool_name}</tool_used>\n<tool_result>\n{result}\n</tool_result>\n"
+
+        if self._current_consecutive_tool_calls < self.max_consecutive_tool_calls:
+            msg += (
+                f"This is consecutive tool call number {self._current_consecutive_tool_calls} "
+                f"of {self.max_consecutive_tool_calls} max. You may now use more tools or respond to the user. "
+                "Do not send the tool_result directly; provide relevant information."
+            )
+        else:
+            msg += (
+                f"This is your final ({self.max_consecutive_tool_calls}) tool call; "
+                f"you MUST now send a response to the user with no tool calls."
+            )
+
+        self._add_chat_msg(msg, role="system")
+
+        self.logger.info("Tool use completed, sending results to Agent")
+        self.current_state = AgentStates.received_message
+        self._set_status_msg("Ready to handle tool results", status_callback_fn)
+
     def _handle_tool_usage(self, tool_to_use: ToolAndParams) -> str:
         try:
             return tool_to_use.invoke_tool()
@@ -334,9 +429,11 @@ class ChatAgent(object):
             return "TOOL FAILED!\n" + str(e)
 
     def get_current_tool_by_name(self, tool_name: str) -> _CT:
+        if not self.tool_use_mode:
+            raise ValueError(tool_name)
         try:
-            return next(x for x in self.get_current_tools() if x.name == tool_name)
-        except StopIteration:
+            return self._current_tools_by_name[tool_name]
+        except KeyError:
             raise ValueError(tool_name)
 
     def message_from_user(self, msg: str | PromptMessage | ImagePromptMessage):
@@ -358,6 +455,19 @@ class ChatAgent(object):
 
     def _append_chat(self, msg: PromptMessage | ImagePromptMessage):
         self.chat_history.append(msg)
+        self._tool_markers(msg)
+
+    def _tool_markers(self, msg: PromptMessage | ImagePromptMessage) -> tuple[bool, bool]:
+        """Whether a message contains a tool call / a tool result, scanned once per message content.
+
+        Entries are keyed by message id and checked against the content object, so a changed (or recycled)
+        message is rescanned and a stale entry can never be returned.
+        """
+        cached = self._tool_marker_cache.get(id(msg))
+        if cached is None or cached[0] is not msg.content:
+            cached = (msg.content, "<tool>" in msg.content, "<tool_result>" in msg.content)
+            self._tool_marker_cache[id(msg)] = cached
+        return cached[1], cached[2]
 
     def _add_chat_msg(self, msg: str, role: Literal["system", "user", "assistant"] = "user"):
         self._append_chat(PromptMessage(role=role, content=msg))
@@ -402,7 +512,11 @@ class ChatAgent(object):
             msg=f"<system>{msg}</system>",
             role="system",
         )
-        tool_call_str = json.dumps({"name": tool.name, "reason": f"Manually called: {tool.name}", "parameters": params})
+        tool_call_str = json.dumps(
+            {"name": tool.name, "reason": f"Manually called: {tool.name}", "parameters": params},
+            default=str,
+            separators=_COMPACT_JSON_SEPARATORS,
+        )
         self._add_chat_msg(f"<tool>{tool_call_str}</tool>", role="assistant")
         self.current_state = AgentStates.using_tools
 
@@ -421,23 +535,27 @@ class ChatAgent(object):
 
         return return_data
 
+    def get_pending_tool_calls_lite(self) -> list[tuple[dict, _CT]]:
+        """The pending tool call dicts paired with their tools, without building `ToolAndParams`."""
+        return [(x, self.get_current_tool_by_name(x["name"])) for x in self.get_pending_tool_calls_data()]
+
     def get_pending_tool_calls_data(self) -> list[dict]:
         if not self.chat_history:
             return []
-        if not (self.chat_history[-1].role == "assistant" and "<tool>" in self.chat_history[-1].content):
+        if not (self.chat_history[-1].role == "assistant" and self._tool_markers(self.chat_history[-1])[0]):
             return []
         completion = self.chat_history[-1]
+        if self._verified_tool_calls and self._verified_tool_calls[0] is completion.content:
+            # this is the message `_verify` already parsed
+            return self._verified_tool_calls[1]
 
         tool_calls = self.extract_tool_calls_from_msg(completion.content)
         return tool_calls
 
     def extract_tool_calls_from_msg(self, msg: str) -> list[dict]:
-        ai_msg, fn_call_str = msg.split("<tool>", maxsplit=1)
-        tool_call_strs = [
-            this_call_str.split("</tool>", maxsplit=1)[0] for this_call_str in fn_call_str.split("<tool>")
-        ]
-        tool_calls = [json.loads(x) for x in tool_call_strs]
-        return tool_calls
+        if "<tool>" not in msg:
+            raise ValueError("Message contains no tool calls")
+        return [json.loads(match.group(1)) for match in _TOOL_CALL_RE.finditer(msg)]
 
     def approve_pending_tool_usage(self):
         if not self.current_state == AgentStates.awaiting_tool_approval:
@@ -477,36 +595,12 @@ class ChatAgent(object):
                 this_model = self.completion_handler.get_model_by_name_or_id(override_model)
         else:
             this_model = self.default_completion_model
-        now = datetime.datetime.now(tz=self.local_timezone)
-        now_fmt = now.strftime("%A, %b %d %Y %I:%M %p")
+        now_fmt = self._current_local_time_str()
 
-        prompt = self.build_tool_usage_prompt(
-            prompt=self.agent_description, available_functions=self.get_current_tools()
-        )
-
-        prompt += (
-            "\n\n---\n\n"
-            "To begin, simply use the `BeginChatOperation` tool"
-            ' with the startup phrase "OrangeCreamsicle" to enable your tools and '
-            "indicate you are ready to process user messages."
-        )
-        response = """
-I am ready for user messages.
-<tool>
-{
-  "name": "BeginChatOperation",
-  "reason": "Performing startup task"
-  "parameters": {
-    "startup_phrase": "OrangeCreamsicle"
-  }
-}
-</tool>
-""".strip()
-
-        chat_prefix = [
-            PromptMessage(role="user", content=prompt),
-            PromptMessage(role="assistant", content=response),
-        ]
+        # the prompt is laid out static-first so providers can reuse their prompt cache across turns: the
+        # (cached) tool usage prefix, then the chat history as-is, and only the final message gets the per-call
+        # system context (time, preferences) injected
+        self._compact_history()
 
         final_message: PromptMessage | ImagePromptMessage = self.chat_history[-1].model_copy()
 
@@ -515,7 +609,7 @@ I am ready for user messages.
             "user_preference_notes": self._user_preferences,
         }
         system_context = {**self._llm_context, **ephemeral_context}
-        system_context_str = json.dumps(system_context, default=str, indent=2)
+        system_context_str = json.dumps(system_context, default=str, separators=_COMPACT_JSON_SEPARATORS)
         msg_content = (
             f"<message_from_user>\n{final_message.content}\n</message_from_user>"
             f"\n<system_context>This section provides data injected automatically by the system at runtime."
@@ -524,7 +618,10 @@ I am ready for user messages.
         )
         final_message.content = msg_content
 
-        chat_prompt = chat_prefix + self.chat_history[:-1] + [final_message]
+        # built as a single list that is extended in place, here and on any retries below
+        chat_prompt = self._get_chat_prefix()
+        self._extend_with_prompt_history(chat_prompt)
+        chat_prompt.append(final_message)
 
         attempt_num = 1
         bad_responses = []
@@ -534,7 +631,7 @@ I am ready for user messages.
                 model=this_model, prompt=chat_prompt, max_response_tokens=max_response_tokens
             )
             try:
-                self._verify(response.content)
+                tool_calls = self._verify(response.content)
             except MsgVerificationError as e:
                 self.logger.warning("Generated response failed verification", exc_info=True)
                 self.logger.debug(response)
@@ -544,22 +641,96 @@ I am ready for user messages.
                 if attempt_num <= max_attempts:
                     error_fmt = ", ".join(e.error_msgs)
                     error_msg = f"<system>Error with tool calls: {error_fmt}</system>"
-                    chat_prompt += [
-                        PromptMessage(role="assistant", content=response.content),
-                        PromptMessage(role="system", content=error_msg),
-                    ]
+                    chat_prompt.append(PromptMessage(role="assistant", content=response.content))
+                    chat_prompt.append(PromptMessage(role="system", content=error_msg))
                     self._add_chat_msg(response.content, "assistant")
                     self._add_chat_msg(error_msg, "system")
             else:
-                # verified with no error, so break out
+                # verified with no error, so break out; keep the parsed calls for get_pending_tool_calls_data
+                self._verified_tool_calls = (response.content, tool_calls)
                 break
         else:  # if we didn't hit a break before running out of attempts
             self.logger.error("Failed to get a valid response within max_attempts value!")
             raise ValueError("Bad AI Response")
         return response.content
 
-    def _verify(self, msg: str):
+    def _current_local_time_str(self) -> str:
+        # the format only goes down to the minute, so reformat at most once a minute
+        minute = int(time.time() // 60)
+        if self._local_time_str_cache[0] != minute:
+            now = datetime.datetime.fromtimestamp(minute * 60, tz=self.local_timezone)
+            self._local_time_str_cache = (minute, now.strftime("%A, %b %d %Y %I:%M %p"))
+        return self._local_time_str_cache[1]
+
+    def _get_chat_prefix(self) -> list[PromptMessage]:
+        tools = self.get_current_tools()
+        cache_key = (self.agent_description, tuple(_tool_cache_key(x) for x in tools))
+        if self._chat_prefix_cache is None or self._chat_prefix_cache[0] != cache_key:
+            prompt = self.build_tool_usage_prompt(prompt=self.agent_description, available_functions=tools)
+            prompt += STARTUP_INSTRUCTIONS_PROMPT
+            self._chat_prefix_cache = (
+                cache_key,
+                [
+                    PromptMessage(role="user", content=prompt),
+                    # the end of the static prefix; providers that need an explicit marker cache everything up to here
+                    PromptMessage(role="assistant", content=STARTUP_RESPONSE, cache_point=True),
+                ],
+            )
+        return list(self._chat_prefix_cache[1])
+
+    def _compact_history(self):
+        """Fold the oldest chat messages into the running history summary once there are too many.
+
+        Only the prompt is affected; `chat_history` keeps every message. Messages from init tools are never folded.
+        """
+        if not self.max_history_msgs:
+            return
+        start = max(self._history_window_start, self._chat_start_idx)
+        if len(self.chat_history) - start <= self.max_history_msgs:
+            return
+        # drop back to half the limit, so summarizing happens every few turns rather than on every turn
+        new_start = len(self.chat_history) - max(self.max_history_msgs // 2, 1)
+        # never start the window on an assistant msg; the synthetic summary exchange already ends with one
+        while new_start < len(self.chat_history) - 1 and self.chat_history[new_start].role == "assistant":
+            new_start += 1
+
+        self.logger.info(f"Summarizing {new_start - start} older chat messages")
+        transcript = "\n\n".join(f"{x.role}: {x.content}" for x in self.chat_history[start:new_start])
+        response = self.completion_handler.get_completion(
+            model=self.default_completion_model,
+            prompt=[
+                PromptMessage(
+                    role="user",
+                    content=HISTORY_SUMMARY_PROMPT.format(
+                        summary=self._history_summary or "(none yet)", transcript=transcript
+                    ),
+                )
+            ],
+            max_response_tokens=self.default_max_response_tokens,
+        )
+        self._history_summary = response.content.strip()
+        self._history_window_start = new_start
+
+    def _extend_with_prompt_history(self, chat_prompt: list[PromptMessage | ImagePromptMessage]):
+        # everything before the final message, with any summarized messages replaced by the summary
+        last_idx = len(self.chat_history) - 1
+        if not self._history_summary:
+            chat_prompt.extend(islice(self.chat_history, last_idx))
+            return
+        chat_prompt.extend(islice(self.chat_history, self._chat_start_idx))
+        chat_prompt.append(
+            PromptMessage(
+                role="user",
+                content=f"<system>Summary of the earlier conversation:\n{self._history_summary}</system>",
+            )
+        )
+        chat_prompt.append(PromptMessage(role="assistant", content="CONTINUE"))
+        chat_prompt.extend(islice(self.chat_history, min(self._history_window_start, last_idx), last_idx))
+
+    def _verify(self, msg: str) -> list[dict]:
+        """Check a generated message, returning its parsed tool calls (empty if it has none)."""
         error_msgs = []
+        tool_calls = []
         if "<tool>" in msg:
             if self._current_consecutive_tool_calls >= self.max_consecutive_tool_calls:
                 error_msgs.append(
@@ -590,14 +761,14 @@ I am ready for user messages.
                             )
         if error_msgs:
             raise MsgVerificationError(error_msgs=error_msgs)
-        return True
+        return tool_calls
 
     @classmethod
     def build_tool_usage_prompt(
         cls, prompt: str, available_functions: list[_CT], preamble_prompt: Optional[str] = None
     ) -> str:
         if available_functions:
-            functions_block = json.dumps([cls.tool_description_to_dict(x) for x in available_functions], indent=2)
+            functions_block = _render_tools_block(tuple(_tool_cache_key(x) for x in available_functions))
         else:
             functions_block = "No tools currently available."
         usage_prompt = TOOL_USAGE_PROMPT.replace("TOOLS_BLOCK_HERE", functions_block)
@@ -608,16 +779,47 @@ I am ready for user messages.
 
     @staticmethod
     def tool_description_to_dict(tool: _CT) -> dict:
-        parameters = jsonref.loads(tool.params_model.schema_json())["properties"]
-        with suppress(KeyError):
-            for param, details in parameters.items():
-                del details["title"]
-        output = {"name": tool.name, "parameters": parameters}
-        descr = tool.params_model.__doc__ or tool.description or ""
-        if descr:
-            output["description"] = descr
+        return json.loads(_tool_description_json(*_tool_cache_key(tool)))
+
+
+def _tool_cache_key(tool: AgentTool) -> tuple[str, Type[BaseModel], Optional[str]]:
+    # everything that goes into a tool's description; the mechanism doesn't affect the prompt
+    return tool.name, tool.params_model, tool.description
+
 
-        return output
+# params model class -> its schema properties (titles stripped) as JSON; shared by every agent in the process
+_PARAMS_SCHEMA_CACHE: dict[Type[BaseModel], str] = {}
+
+
+def _params_schema_properties(params_model: Type[BaseModel]) -> dict:
+    # building the schema is comparatively slow and only depends on the model class, so do it once per class;
+    # stored as JSON (which also resolves the jsonref proxies) so every caller gets its own fresh dict.
+    # indent keeps json on its pure-python encoder, which (unlike the C one) accepts the proxies
+    try:
+        return json.loads(_PARAMS_SCHEMA_CACHE[params_model])
+    except KeyError:
+        pass
+    parameters = jsonref.replace_refs(params_model.model_json_schema())["properties"]
+    with suppress(KeyError):
+        for param, details in parameters.items():
+            del details["title"]
+    _PARAMS_SCHEMA_CACHE[params_model] = json.dumps(parameters, indent=2)
+    return json.loads(_PARAMS_SCHEMA_CACHE[params_model])
+
+
+@lru_cache(maxsize=None)
+def _tool_description_json(name: str, params_model: Type[BaseModel], description: Optional[str]) -> str:
+    output = {"name": name, "parameters": _params_schema_properties(params_model)}
+    descr = params_model.__doc__ or description or ""
+    if descr:
+        output["description"] = descr
+
+    return json.dumps(output)
+
+
+@lru_cache(maxsize=32)
+def _render_tools_block(tool_keys: tuple[tuple[str, Type[BaseModel], Optional[str]], ...]) -> str:
+    return json.dumps([json.loads(_tool_description_json(*x)) for x in tool_keys], separators=_COMPACT_JSON_SEPARATORS)
 
 
 TOOL_USAGE_PROMPT = """
@@ -647,3 +849,40 @@ Available tools:
 TOOLS_BLOCK_HERE
 </available_tools>
 """.strip()
+
+HISTORY_SUMMARY_PROMPT = """
+Update the running summary of a conversation between a user and an AI assistant.
+
+Current summary:
+<summary>
+{summary}
+</summary>
+
+Messages to fold into the summary:
+<messages>
+{transcript}
+</messages>
+
+Respond with only the updated summary. Keep facts, decisions, user preferences, and any tool results that may be
+needed later; drop small talk and formatting.
+""".strip()
+
+STARTUP_INSTRUCTIONS_PROMPT = (
+    "\n\n---\n\n"
+    "To begin, simply use the `BeginChatOperation` tool"
+    ' with the startup phrase "OrangeCreamsicle" to enable your tools and '
+    "indicate you are ready to process user messages."
+)
+
+STARTUP_RESPONSE = """
+I am ready for user messages.
+<tool>
+{
+  "name": "BeginChatOperation",
+  "reason": "Performing startup task"
+  "parameters": {
+    "startup_phrase": "OrangeCreamsicle"
+  }
+}
+</tool>
+""".strip()
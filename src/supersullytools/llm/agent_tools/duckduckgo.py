@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from duckduckgo_search import DDGS
 from pydantic import BaseModel
 
@@ -19,6 +21,13 @@ class ImageSearch(BaseModel):
 
 
 def get_ddg_tools(include_news=True, include_web=True, include_image=True) -> list[AgentTool]:
+    # a new list each call, so callers can add to it without affecting anyone else
+    return list(_build_ddg_tools(include_news, include_web, include_image))
+
+
+# the tools are stateless, so each variant is built once
+@lru_cache(maxsize=8)
+def _build_ddg_tools(include_news: bool, include_web: bool, include_image: bool) -> tuple[AgentTool, ...]:
     def _handle_tool_usage(params: PydanticModel):
         with DDGS() as ddgs:
             match params:
@@ -54,7 +63,7 @@ def get_ddg_tools(include_news=True, include_web=True, include_image=True) -> li
     if include_image:
         _add_tool(ImageSearch, True)
 
-    return tools
+    return tuple(tools)
 
 
 # def get_result(search_type, query) -> list[dict | str]:
@@ -1,16 +1,27 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
 from abc import ABC
-from base64 import b64decode
+from base64 import b64decode, b64encode
+from collections import OrderedDict
 from datetime import datetime, timezone
+from functools import cached_property, lru_cache
+from itertools import islice
 from logging import Logger
-from typing import TYPE_CHECKING, Literal, Optional, TypeVar, Union
+from typing import TYPE_CHECKING, Iterator, Literal, Optional, TypeVar, Union
 
 import boto3
 import openai
-from pydantic import AwareDatetime, BaseModel, computed_field
+from pydantic import AwareDatetime, BaseModel, Field, computed_field, field_validator
 
 if TYPE_CHECKING:
+    import numpy as np
     from mypy_boto3_bedrock_runtime import BedrockRuntimeClient
     from openai import Client
+    from openai.types import CompletionUsage
+    from openai.types.chat import ChatCompletion
 
     from supersullytools.llm.trackers import CompletionTracker, UsageStats
 
@@ -18,14 +29,34 @@ if TYPE_CHECKING:
 class PromptMessage(BaseModel):
     role: Literal["system", "user", "assistant"]
     content: str
+    # marks the end of a static prompt prefix (e.g. ChatAgent's tool usage exchange); for Bedrock models with
+    # `supports_prompt_caching`, a Converse `cachePoint` is placed after this message. Not serialized
+    cache_point: bool = Field(default=False, exclude=True)
 
 
 class ImagePromptMessage(BaseModel):
     role: Literal["user"] = "user"
     content: str
-    images: list[str]  # images in base64 encoded format
+    images: list[str]  # images in base64 encoded format; raw image bytes are accepted and encoded on creation
     image_formats: list[Literal["jpeg", "png"]]
 
+    @field_validator("images", mode="before")
+    @classmethod
+    def _encode_raw_images(cls, value):
+        if isinstance(value, list):
+            return [b64encode(x).decode() if isinstance(x, bytes) else x for x in value]
+        return value
+
+    # the provider-specific image forms are built once per message, since the same message is resent with every
+    # later turn of a conversation; treat `images` as fixed once the message is created
+    @cached_property
+    def data_urls(self) -> list[str]:
+        return [f"data:image/{image_fmt};base64,{image}" for image, image_fmt in zip(self.images, self.image_formats)]
+
+    @cached_property
+    def image_bytes(self) -> list[bytes]:
+        return [b64decode(image) for image in self.images]
+
 
 class CompletionModel(BaseModel, ABC):
     provider: str
@@ -86,11 +117,168 @@ class BedrockCompletionResponse(BaseModel):
 
 class BedrockModel(CompletionModel):
     provider: Literal["AWS Bedrock"] = "AWS Bedrock"
+    # mark the system prompt, and any message flagged `cache_point`, as cacheable prefixes (Converse `cachePoint`s)
+    supports_prompt_caching: bool = False
 
 
 CompletionModelType = TypeVar("CompletionModelType", bound=CompletionModel)
 
 
+class LLMResponseCache:
+    """In-memory LRU cache of completion responses, with entries expiring after `ttl_seconds`.
+
+    Keyed on the exact model id, prompt and max response tokens; see `CompletionHandler(response_cache=...)`.
+    """
+
+    def __init__(self, maxsize: int = 1000, ttl_seconds: float = 3600):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, CompletionResponse]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def make_key(
+        llm: CompletionModel, prompt: list[PromptMessage | ImagePromptMessage], max_response_tokens: int
+    ) -> str:
+        key_data = {
+            "model": llm.llm_id,
+            "prompt": [x.model_dump(mode="json") for x in prompt],
+            "max_tokens": max_response_tokens,
+        }
+        return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[CompletionResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+        return entry[1].model_copy(deep=True)
+
+    def set(self, key: str, response: CompletionResponse):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, response.model_copy(deep=True))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self._hits, "misses": self._misses, "size": len(self._entries)}
+
+
+class SemanticCache:
+    """In-memory cache matching plain-text prompts by embedding similarity; requires numpy.
+
+    A prompt whose (normalized) embedding has cosine similarity of at least `threshold` with an earlier prompt sent
+    to the same model, with the same max response tokens, gets that earlier response back. Embeddings come from the
+    handler's OpenAI client; those calls are not sent to the completion trackers. Each (model, max tokens) pair
+    keeps at most `maxsize` entries, evicting the least recently used.
+    """
+
+    def __init__(self, threshold: float = 0.92, maxsize: int = 500, embedding_model: str = "text-embedding-3-small"):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.embedding_model = embedding_model
+        # (llm_id, max_tokens) -> (embeddings matrix (N, dims), responses, last-used tick per entry)
+        self._partitions: dict[tuple[str, int], tuple["np.ndarray", list[CompletionResponse], list[int]]] = {}
+        self._tick = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def embed(self, openai_client: "Client", text: str) -> "np.ndarray":
+        import numpy as np
+
+        response = openai_client.embeddings.create(model=self.embedding_model, input=text)
+        vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def get(self, llm: CompletionModel, max_response_tokens: int, vector: "np.ndarray") -> Optional[CompletionResponse]:
+        with self._lock:
+            partition = self._partitions.get((llm.llm_id, max_response_tokens))
+            response = None
+            if partition is not None:
+                matrix, responses, last_used = partition
+                similarities = matrix @ vector
+                best = int(similarities.argmax())
+                if similarities[best] >= self.threshold:
+                    self._tick += 1
+                    last_used[best] = self._tick
+                    response = responses[best]
+            if response is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+        return response.model_copy(deep=True)
+
+    def add(self, llm: CompletionModel, max_response_tokens: int, vector: "np.ndarray", response: CompletionResponse):
+        import numpy as np
+
+        with self._lock:
+            self._tick += 1
+            key = (llm.llm_id, max_response_tokens)
+            if key not in self._partitions:
+                self._partitions[key] = (vector[np.newaxis, :], [response.model_copy(deep=True)], [self._tick])
+                return
+            matrix, responses, last_used = self._partitions[key]
+            if len(responses) >= self.maxsize:
+                # overwrite the least recently used entry in place
+                idx = last_used.index(min(last_used))
+                matrix[idx] = vector
+                responses[idx] = response.model_copy(deep=True)
+                last_used[idx] = self._tick
+            else:
+                self._partitions[key] = (
+                    np.vstack([matrix, vector]),
+                    responses + [response.model_copy(deep=True)],
+                    last_used + [self._tick],
+                )
+
+    def clear(self):
+        with self._lock:
+            self._partitions.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            size = sum(len(x[1]) for x in self._partitions.values())
+            return {"hits": self._hits, "misses": self._misses, "size": size}
+
+
+def _openai_token_counts(usage: Optional["CompletionUsage"]) -> tuple[int, int, int, int]:
+    """(input, cached input, reasoning, output) token counts from a Chat Completions usage block.
+
+    Missing usage, or missing token details (some OpenAI-compatible endpoints omit them), count as 0.
+    """
+    if usage is None:
+        return 0, 0, 0, 0
+    cached = getattr(usage.prompt_tokens_details, "cached_tokens", None) or 0
+    reasoning = getattr(usage.completion_tokens_details, "reasoning_tokens", None) or 0
+    return usage.prompt_tokens or 0, cached, reasoning, usage.completion_tokens or 0
+
+
+def _bedrock_token_counts(usage: dict) -> tuple[int, int, int]:
+    """(input, cached input, output) token counts from a Converse usage block.
+
+    Bedrock reports prompt-cache reads/writes separately from `inputTokens`; they are folded back in so
+    `input_tokens` is the full prompt size, as it is for OpenAI responses.
+    """
+    cache_read = usage.get("cacheReadInputTokens", 0)
+    input_tokens = usage.get("inputTokens", 0) + cache_read + usage.get("cacheWriteInputTokens", 0)
+    return input_tokens, cache_read, usage.get("outputTokens", 0)
+
+
 class CompletionHandler:
     def __init__(
         self,
@@ -103,6 +291,12 @@ class CompletionHandler:
         enable_openai=True,
         enable_bedrock=True,
         default_max_response_tokens: int = 1000,
+        # optional cache of responses for repeated identical requests; off unless provided
+        response_cache: Optional[LLMResponseCache] = None,
+        # optional similarity cache for plain-text prompts, checked after `response_cache`; needs OpenAI enabled
+        semantic_cache: Optional[SemanticCache] = None,
+        # connection pool size for the bedrock-runtime client created here (when one isn't passed in)
+        max_pool_connections: int = 50,
     ):
         self.logger = logger
         self.enable_openai = enable_openai
@@ -116,32 +310,52 @@ class CompletionHandler:
 
         self.bedrock_runtime_client = None
         if self.enable_bedrock:
-            self.bedrock_runtime_client = bedrock_runtime_client or boto3.client("bedrock-runtime")
+            if bedrock_runtime_client is None:
+                from botocore.config import Config
+
+                # a larger pool, so concurrent completions (e.g. parallel agent/tool work) reuse kept-alive connections
+                bedrock_runtime_client = boto3.client(
+                    "bedrock-runtime", config=Config(max_pool_connections=max_pool_connections, tcp_keepalive=True)
+                )
+            self.bedrock_runtime_client = bedrock_runtime_client
 
         self.debug_output_prompt_and_response = debug_output_prompt_and_response
         if available_models:
             self.available_models = available_models
         else:
             if enable_bedrock and enable_openai:
-                self.available_models = DEFAULT_USE_MODELS
+                self.available_models = list(get_default_models())
             elif enable_bedrock:
-                self.available_models = [x for x in DEFAULT_USE_MODELS if isinstance(x, BedrockModel)]
+                self.available_models = list(get_default_models("AWS Bedrock"))
             elif enable_openai:
-                self.available_models = [x for x in DEFAULT_USE_MODELS if isinstance(x, OpenAiModel)]
+                self.available_models = list(get_default_models("OpenAI"))
             else:
                 # what do?
                 raise ValueError("No models specified")
 
         self.default_max_response_tokens = default_max_response_tokens
+        self.response_cache = response_cache
+        self.semantic_cache = semantic_cache
+
+    @property
+    def available_models(self) -> list["CompletionModel"]:
+        return self._available_models
+
+    @available_models.setter
+    def available_models(self, value: list["CompletionModel"]):
+        self._available_models = value
+        # names take priority over ids, and the first model listed wins, matching the original lookup order
+        self._model_index: dict[str, "CompletionModel"] = {}
+        for model in value:
+            self._model_index.setdefault(model.llm, model)
+        for model in value:
+            self._model_index.setdefault(model.llm_id, model)
 
     def get_model_by_name_or_id(self, model_name_or_id: str) -> "CompletionModelType":
         try:
-            return next(x for x in self.available_models if x.llm == model_name_or_id)
-        except StopIteration:
-            try:
-                return next(x for x in self.available_models if x.llm_id == model_name_or_id)
-            except StopIteration:
-                raise ValueError(f"No model found {model_name_or_id=}") from None
+            return self._model_index[model_name_or_id]
+        except KeyError:
+            raise ValueError(f"No model found {model_name_or_id=}") from None
 
     def get_completion(
         self,
@@ -149,14 +363,47 @@ class CompletionHandler:
         prompt: str | list[PromptMessage | ImagePromptMessage],
         max_response_tokens: Optional[int] = None,
         extra_trackers: Optional[list["UsageStats"]] = None,
+        use_cache: bool = True,
     ) -> "CompletionResponse":
+        """Generate a completion.
+
+        When the handler has a `response_cache` and `use_cache` is set, an identical earlier request (same model,
+        prompt and max_response_tokens) is answered from the cache; cache hits are not sent to the trackers.
+        Likewise, with a `semantic_cache`, a plain string prompt close enough to an earlier one is answered from it.
+
+        Providers cache prompt prefixes server-side (automatically for OpenAI; for Bedrock models with
+        `supports_prompt_caching`, up to the end of the system prompt and of any message flagged `cache_point`), so
+        keep static content such as the system message first and unchanged between requests to benefit.
+        """
         if max_response_tokens is None:
             max_response_tokens = self.default_max_response_tokens
         if isinstance(model, str):
             model = self.get_model_by_name_or_id(model)
 
-        if isinstance(prompt, str):
-            prompt = [PromptMessage(content=prompt, role="user")]
+        text_prompt = prompt if isinstance(prompt, str) else None
+        if text_prompt is not None:
+            prompt = [PromptMessage(content=text_prompt, role="user")]
+
+        cache_key = None
+        if self.response_cache is not None and use_cache:
+            cache_key = self.response_cache.make_key(model, prompt, max_response_tokens)
+            if cached_response := self.response_cache.get(cache_key):
+                self.logger.info(f"Returning cached completion for {model.llm}")
+                return cached_response
+
+        # the prompt is only embedded after an exact-cache miss, since the embedding is itself a (billed) api call
+        semantic_vector = None
+        if text_prompt is not None and self.semantic_cache is not None and use_cache and self.openai_client is not None:
+            try:
+                semantic_vector = self.semantic_cache.embed(self.openai_client, text_prompt)
+            except Exception:
+                self.logger.warning("Error embedding prompt for the semantic cache! Continuing", exc_info=True)
+        if semantic_vector is not None:
+            if cached_response := self.semantic_cache.get(model, max_response_tokens, semantic_vector):
+                self.logger.info(f"Returning semantically cached completion for {model.llm}")
+                if cache_key is not None:
+                    self.response_cache.set(cache_key, cached_response)
+                return cached_response
 
         match model:
             case OpenAiModel():
@@ -165,6 +412,97 @@ class CompletionHandler:
                 response = self._get_bedrock_completion(model, prompt, max_response_tokens)
             case _:
                 raise ValueError(model)
+        if cache_key is not None:
+            self.response_cache.set(cache_key, response)
+        if semantic_vector is not None:
+            self.semantic_cache.add(model, max_response_tokens, semantic_vector, response)
+        self._track_completion(model, prompt, response, extra_trackers)
+
+        self.logger.debug("Completion generated\n" + response.model_dump_json(indent=2, exclude={"content"}))
+
+        return response
+
+    async def aget_completion(
+        self,
+        model: Union[str, "CompletionModel"],
+        prompt: str | list[PromptMessage | ImagePromptMessage],
+        max_response_tokens: Optional[int] = None,
+        extra_trackers: Optional[list["UsageStats"]] = None,
+        use_cache: bool = True,
+    ) -> "CompletionResponse":
+        """Async variant of `get_completion`; the (blocking) provider call runs in a worker thread."""
+        return await asyncio.to_thread(
+            self.get_completion,
+            model,
+            prompt,
+            max_response_tokens=max_response_tokens,
+            extra_trackers=extra_trackers,
+            use_cache=use_cache,
+        )
+
+    async def abatch_completions(
+        self,
+        model: Union[str, "CompletionModel"],
+        prompts: list[str | list[PromptMessage | ImagePromptMessage]],
+        max_response_tokens: Optional[int] = None,
+        max_concurrency: int = 10,
+        use_cache: bool = True,
+    ) -> list["CompletionResponse"]:
+        """Generate a completion for each prompt, at most `max_concurrency` at a time; results are in prompt order.
+
+        Throttling (429) retries are left to the provider clients, which already back off and retry.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def _complete(prompt) -> "CompletionResponse":
+            async with semaphore:
+                return await self.aget_completion(
+                    model, prompt, max_response_tokens=max_response_tokens, use_cache=use_cache
+                )
+
+        return await asyncio.gather(*[_complete(x) for x in prompts])
+
+    def get_completion_stream(
+        self,
+        model: Union[str, "CompletionModel"],
+        prompt: str | list[PromptMessage | ImagePromptMessage],
+        max_response_tokens: Optional[int] = None,
+        extra_trackers: Optional[list["UsageStats"]] = None,
+    ) -> Iterator[Union[str, "CompletionResponse"]]:
+        """Generate a completion, yielding text chunks as they arrive and then the final `CompletionResponse`.
+
+        The completion is tracked once the stream finishes; streamed completions bypass the response caches.
+        """
+        if max_response_tokens is None:
+            max_response_tokens = self.default_max_response_tokens
+        if isinstance(model, str):
+            model = self.get_model_by_name_or_id(model)
+        if isinstance(prompt, str):
+            prompt = [PromptMessage(content=prompt, role="user")]
+
+        match model:
+            case OpenAiModel():
+                stream = self._stream_openai_completion(model, prompt, max_response_tokens)
+            case BedrockModel():
+                stream = self._stream_bedrock_completion(model, prompt, max_response_tokens)
+            case _:
+                raise ValueError(model)
+        for chunk in stream:
+            if isinstance(chunk, str):
+                yield chunk
+            else:
+                response = chunk
+        self._track_completion(model, prompt, response, extra_trackers)
+        self.logger.debug("Completion generated\n" + response.model_dump_json(indent=2, exclude={"content"}))
+        yield response
+
+    def _track_completion(
+        self,
+        model: "CompletionModel",
+        prompt: list[PromptMessage | ImagePromptMessage],
+        response: "CompletionResponse",
+        extra_trackers: Optional[list["UsageStats"]],
+    ):
         try:
             if self.completion_tracker:
                 self.completion_tracker.track_completion(model, prompt, response)
@@ -182,47 +520,38 @@ class CompletionHandler:
         except Exception:
             self.logger.warning("Error with extra trackers! Continuing", exc_info=True)
 
-        self.logger.debug("Completion generated\n" + response.model_dump_json(indent=2, exclude={"content"}))
-
-        return response
-
-    def _get_bedrock_completion(
-        self,
-        llm: BedrockModel,
-        prompt: list[PromptMessage | ImagePromptMessage],
-        max_response_tokens: int,
-        temperature=0.0,
-    ) -> "CompletionResponse":
-        prompt = [] or prompt
+    def _build_bedrock_messages(
+        self, llm: BedrockModel, prompt: list[PromptMessage | ImagePromptMessage]
+    ) -> tuple[list[dict], list[dict]]:
+        """Convert the prompt into Converse API (system, messages) lists."""
         if not self.enable_bedrock:
             raise RuntimeError("Bedrock completions disabled!")
-        # boto_input = llm.prepare_bedrock_body(prompt, max_response_tokens)
-
-        self.logger.info(f"Generating Bedrock Completion {llm.llm_id}")
 
-        # Invoke Bedrock API
+        # leading system messages form the system prompt; later ones stay in place (as user turns), since their
+        # position in the conversation matters (e.g. tool results) and moving them would change the cached prefix;
+        # the final message is always kept as a turn, since Converse needs at least one
+        num_leading_system = 0
+        while num_leading_system < len(prompt) - 1 and prompt[num_leading_system].role == "system":
+            num_leading_system += 1
+        system_prompt = [{"text": msg.content} for msg in prompt[:num_leading_system]]
+        if system_prompt and llm.supports_prompt_caching:
+            system_prompt.append({"cachePoint": {"type": "default"}})
 
-        if prompt[0].role == "system":
-            system_msg = prompt[0]
-            prompt = prompt[1:]
-        else:
-            system_msg = None
-
-        started_at = datetime.now(timezone.utc)
         messages = []
-        debug_print_messages = []
-        for msg in prompt:
+        for msg in islice(prompt, num_leading_system, None):
             add_role = "user" if msg.role == "system" else msg.role
-            debug_print_messages.append({"role": add_role, "content": [{"text": msg.content}]})
             match msg:
                 case PromptMessage():
-                    messages.append({"role": add_role, "content": [{"text": msg.content}]})
+                    content = [{"text": msg.content}]
+                    if msg.cache_point and llm.supports_prompt_caching:
+                        content.append({"cachePoint": {"type": "default"}})
+                    messages.append({"role": add_role, "content": content})
                 case ImagePromptMessage():
                     if not llm.supports_images:
                         raise ValueError("Specified model does not have image prompt support")
                     content = [{"text": msg.content}]
-                    for image, image_fmt in zip(msg.images, msg.image_formats):
-                        content.append({"image": {"format": image_fmt, "source": {"bytes": b64decode(image)}}})
+                    for image, image_fmt in zip(msg.image_bytes, msg.image_formats):
+                        content.append({"image": {"format": image_fmt, "source": {"bytes": image}}})
                     messages.append(
                         {
                             "role": add_role,
@@ -234,11 +563,19 @@ class CompletionHandler:
 
         if self.debug_output_prompt_and_response:
             self.logger.debug(f"LLM input:\n{messages}")
+        return system_prompt, messages
 
-        if system_msg:
-            system_prompt = [{"text": system_msg.content}]
-        else:
-            system_prompt = []
+    def _get_bedrock_completion(
+        self,
+        llm: BedrockModel,
+        prompt: list[PromptMessage | ImagePromptMessage],
+        max_response_tokens: int,
+        temperature=0.0,
+    ) -> "CompletionResponse":
+        system_prompt, messages = self._build_bedrock_messages(llm, prompt)
+
+        self.logger.info(f"Generating Bedrock Completion {llm.llm_id}")
+        started_ns = time.perf_counter_ns()
         bedrock_response = self.bedrock_runtime_client.converse(
             modelId=llm.llm_id,
             messages=messages,
@@ -249,37 +586,79 @@ class CompletionHandler:
 
         # return response
         response_body = bedrock_response["output"]["message"]["content"][0]["text"].strip()
-        finished_at = datetime.now(timezone.utc)
+        elapsed_ms = (time.perf_counter_ns() - started_ns) // 1_000_000
         self.logger.info("Generation complete")
         if self.debug_output_prompt_and_response:
             self.logger.debug(f"LLM Response:\n{bedrock_response}")
 
-        token_usage = bedrock_response["usage"]
-        input_tokens = token_usage["inputTokens"]
-        output_tokens = token_usage["outputTokens"]
-        # total_tokens = token_usage["totalTokens"]
-        # stop_reason = bedrock_response["stopReason"]
+        input_tokens, cached_input_tokens, output_tokens = _bedrock_token_counts(bedrock_response["usage"])
 
-        return CompletionResponse(
+        return CompletionResponse.model_construct(
             content=response_body,
             input_tokens=input_tokens,
+            cached_input_tokens=cached_input_tokens,
             output_tokens=output_tokens,
-            llm_metadata=CompletionModel.model_validate(llm, from_attributes=True),
-            generated_at=finished_at,
-            completion_time_ms=int((finished_at - started_at).total_seconds() * 1000),
+            llm_metadata=llm,
+            generated_at=datetime.now(timezone.utc),
+            completion_time_ms=elapsed_ms,
             stop_reason=bedrock_response["stopReason"],
             response_metadata={"usage": bedrock_response["usage"], "metrics": bedrock_response["metrics"]},
         )
 
-    def _get_openai_completion(
-        self, llm: OpenAiModel, prompt: list[PromptMessage | ImagePromptMessage], max_response_tokens: int
-    ) -> "CompletionResponse":
+    def _stream_bedrock_completion(
+        self,
+        llm: BedrockModel,
+        prompt: list[PromptMessage | ImagePromptMessage],
+        max_response_tokens: int,
+        temperature=0.0,
+    ) -> Iterator[Union[str, "CompletionResponse"]]:
+        system_prompt, messages = self._build_bedrock_messages(llm, prompt)
+
+        self.logger.info(f"Streaming Bedrock Completion {llm.llm_id}")
+        started_ns = time.perf_counter_ns()
+        bedrock_response = self.bedrock_runtime_client.converse_stream(
+            modelId=llm.llm_id,
+            messages=messages,
+            system=system_prompt,
+            inferenceConfig={"temperature": temperature, "maxTokens": max_response_tokens},
+        )
+
+        chunks = []
+        stop_reason = None
+        metadata = {}
+        for event in bedrock_response["stream"]:
+            if "contentBlockDelta" in event:
+                if text := event["contentBlockDelta"]["delta"].get("text"):
+                    chunks.append(text)
+                    yield text
+            elif "messageStop" in event:
+                stop_reason = event["messageStop"]["stopReason"]
+            elif "metadata" in event:
+                metadata = event["metadata"]
+        elapsed_ms = (time.perf_counter_ns() - started_ns) // 1_000_000
+        self.logger.info("Generation complete")
+
+        # a stream cut short may never deliver its metadata event
+        usage = metadata.get("usage", {})
+        input_tokens, cached_input_tokens, output_tokens = _bedrock_token_counts(usage)
+        yield CompletionResponse.model_construct(
+            content="".join(chunks).strip(),
+            input_tokens=input_tokens,
+            cached_input_tokens=cached_input_tokens,
+            output_tokens=output_tokens,
+            llm_metadata=llm,
+            generated_at=datetime.now(timezone.utc),
+            completion_time_ms=elapsed_ms,
+            stop_reason=stop_reason,
+            response_metadata={"usage": usage, "metrics": metadata.get("metrics")},
+        )
+
+    def _build_openai_messages(self, llm: OpenAiModel, prompt: list[PromptMessage | ImagePromptMessage]) -> list[dict]:
+        """Convert the prompt into a Chat Completions messages list."""
         if not self.enable_openai:
             raise RuntimeError("OpenAI completions disabled!")
         chat_history = []
-        debug_print_chat_history = []
         for msg in prompt:
-            debug_print_chat_history.append({"role": msg.role, "content": msg.content})
             if msg.role == "system":
                 role = msg.role if llm.supports_system_msgs else "user"
             else:
@@ -289,14 +668,8 @@ class CompletionHandler:
                     chat_history.append({"role": role, "content": msg.content})
                 case ImagePromptMessage():
                     content = [{"type": "text", "text": msg.content}]
-                    debug_print_chat_history.append({"role": role, "content": msg.content, "include_image": True})
-                    for image, image_fmt in zip(msg.images, msg.image_formats):
-                        content.append(
-                            {
-                                "type": "image_url",
-                                "image_url": {"url": f"data:image/{image_fmt};base64,{image}"},
-                            }
-                        )
+                    for data_url in msg.data_urls:
+                        content.append({"type": "image_url", "image_url": {"url": data_url}})
                     chat_history.append(
                         {
                             "role": role,
@@ -305,30 +678,152 @@ class CompletionHandler:
                     )
                 case _:
                     raise ValueError("Base prompt type")
-        started_at = datetime.now(timezone.utc)
-
-        self.logger.info("Generating Open AI ChatCompletion")
         if self.debug_output_prompt_and_response:
             self.logger.debug(f"LLM input:\n{chat_history}")
+        return chat_history
+
+    def _get_openai_completion(
+        self, llm: OpenAiModel, prompt: list[PromptMessage | ImagePromptMessage], max_response_tokens: int
+    ) -> "CompletionResponse":
+        chat_history = self._build_openai_messages(llm, prompt)
+        started_ns = time.perf_counter_ns()
+
+        self.logger.info("Generating Open AI ChatCompletion")
         openai_response = self.openai_client.chat.completions.create(
             model=llm.llm_id, messages=chat_history, max_completion_tokens=max_response_tokens
         )
         if self.debug_output_prompt_and_response:
             self.logger.debug(f"LLM response:\n{openai_response}")
-        finished_at = datetime.now(timezone.utc)
+        elapsed_ms = (time.perf_counter_ns() - started_ns) // 1_000_000
+        return self._openai_completion_response(llm, openai_response, elapsed_ms)
 
-        return CompletionResponse(
+    @staticmethod
+    def _openai_completion_response(
+        llm: OpenAiModel, openai_response: "ChatCompletion", completion_time_ms: int
+    ) -> "CompletionResponse":
+        input_tokens, cached_input_tokens, reasoning_tokens, output_tokens = _openai_token_counts(openai_response.usage)
+        return CompletionResponse.model_construct(
             content=openai_response.choices[0].message.content,
-            input_tokens=openai_response.usage.prompt_tokens,
-            reasoning_tokens=openai_response.usage.completion_tokens_details.reasoning_tokens or 0,
-            cached_input_tokens=openai_response.usage.prompt_tokens_details.cached_tokens or 0,
-            output_tokens=openai_response.usage.completion_tokens,
-            llm_metadata=CompletionModel.model_validate(llm, from_attributes=True),
-            generated_at=finished_at,
+            input_tokens=input_tokens,
+            reasoning_tokens=reasoning_tokens,
+            cached_input_tokens=cached_input_tokens,
+            output_tokens=output_tokens,
+            llm_metadata=llm,
+            generated_at=datetime.now(timezone.utc),
             stop_reason=openai_response.choices[0].finish_reason,
             response_metadata=openai_response.model_dump(mode="json", exclude={"choices"}),
-            completion_time_ms=int((finished_at - started_at).total_seconds() * 1000),
+            completion_time_ms=completion_time_ms,
+        )
+
+    def _stream_openai_completion(
+        self, llm: OpenAiModel, prompt: list[PromptMessage | ImagePromptMessage], max_response_tokens: int
+    ) -> Iterator[Union[str, "CompletionResponse"]]:
+        chat_history = self._build_openai_messages(llm, prompt)
+        started_ns = time.perf_counter_ns()
+
+        self.logger.info("Streaming Open AI ChatCompletion")
+        openai_stream = self.openai_client.chat.completions.create(
+            model=llm.llm_id,
+            messages=chat_history,
+            max_completion_tokens=max_response_tokens,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+
+        chunks = []
+        stop_reason = None
+        usage = None
+        for chunk in openai_stream:
+            # the usage totals arrive on a final chunk with no choices
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            if chunk.choices[0].finish_reason:
+                stop_reason = chunk.choices[0].finish_reason
+            if text := chunk.choices[0].delta.content:
+                chunks.append(text)
+                yield text
+        elapsed_ms = (time.perf_counter_ns() - started_ns) // 1_000_000
+
+        # a stream cut short (or an endpoint ignoring `stream_options`) may never deliver the usage chunk
+        input_tokens, cached_input_tokens, reasoning_tokens, output_tokens = _openai_token_counts(usage)
+        yield CompletionResponse.model_construct(
+            content="".join(chunks),
+            input_tokens=input_tokens,
+            reasoning_tokens=reasoning_tokens,
+            cached_input_tokens=cached_input_tokens,
+            output_tokens=output_tokens,
+            llm_metadata=llm,
+            generated_at=datetime.now(timezone.utc),
+            stop_reason=stop_reason,
+            response_metadata={"usage": usage.model_dump(mode="json") if usage is not None else None},
+            completion_time_ms=elapsed_ms,
+        )
+
+    def submit_openai_batch(
+        self,
+        model: Union[str, "CompletionModel"],
+        prompts: list[str | list[PromptMessage | ImagePromptMessage]],
+        max_response_tokens: Optional[int] = None,
+    ) -> str:
+        """Submit the prompts as an OpenAI Batch API job (processed within 24h, at a discount); returns the batch id.
+
+        Collect the results with `get_openai_batch_results`.
+        """
+        if max_response_tokens is None:
+            max_response_tokens = self.default_max_response_tokens
+        if isinstance(model, str):
+            model = self.get_model_by_name_or_id(model)
+        if not isinstance(model, OpenAiModel):
+            raise ValueError("Batch completions are only supported for OpenAI models")
+
+        lines = []
+        for idx, prompt in enumerate(prompts):
+            if isinstance(prompt, str):
+                prompt = [PromptMessage(content=prompt, role="user")]
+            body = {
+                "model": model.llm_id,
+                "messages": self._build_openai_messages(model, prompt),
+                "max_completion_tokens": max_response_tokens,
+            }
+            lines.append(
+                json.dumps({"custom_id": str(idx), "method": "POST", "url": "/v1/chat/completions", "body": body})
+            )
+        batch_file = self.openai_client.files.create(file=("batch.jsonl", "\n".join(lines).encode()), purpose="batch")
+        batch = self.openai_client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+            metadata={"llm_id": model.llm_id},
         )
+        self.logger.info(f"Submitted OpenAI batch {batch.id} with {len(lines)} requests")
+        return batch.id
+
+    def get_openai_batch_results(self, batch_id: str) -> Optional[list[Optional["CompletionResponse"]]]:
+        """Responses for a batch from `submit_openai_batch`, in prompt order, or None if it is still running.
+
+        Requests that failed within the batch come back as None. Batch responses are not sent to the trackers, and
+        their `completion_cost` uses the regular (not batch-discounted) prices.
+        """
+        from openai.types.chat import ChatCompletion
+
+        batch = self.openai_client.batches.retrieve(batch_id)
+        if batch.status in ("validating", "in_progress", "finalizing"):
+            return None
+        if batch.status != "completed":
+            raise RuntimeError(f"OpenAI batch {batch_id} did not complete: {batch.status}")
+
+        llm = self.get_model_by_name_or_id(batch.metadata["llm_id"])
+        results: list[Optional[CompletionResponse]] = [None] * batch.request_counts.total
+        if batch.output_file_id:
+            for line in self.openai_client.files.content(batch.output_file_id).text.splitlines():
+                item = json.loads(line)
+                if item.get("error") or item["response"]["status_code"] != 200:
+                    continue
+                openai_response = ChatCompletion.model_validate(item["response"]["body"])
+                results[int(item["custom_id"])] = self._openai_completion_response(llm, openai_response, 0)
+        return results
 
 
 class Gpt3p5Turbo(OpenAiModel):
@@ -468,8 +963,10 @@ class Claude3p5Haiku(Claude3Sonnet):
     llm: str = "Claude 3.5 Haiku"
     llm_id: str = "anthropic.claude-3-5-haiku-20241022-v1:0"
     input_price_per_1k: float = 0.001
+    cached_input_price_per_1k: float = 0.0001
     output_price_per_1k: float = 0.005
     supports_images: bool = True
+    supports_prompt_caching: bool = True
 
 
 class Claude3Opus(Claude3Sonnet):
@@ -499,37 +996,49 @@ class Mixtral8x7B(Mistral7B):
     supports_images: bool = False
 
 
-ALL_MODELS = [
-    Gpt3p5Turbo(),
-    Gpt4Omni(),
-    Gpt4OmniMini(),
-    Gpt4Turbo(),
-    OpenAIO1Preview(),
-    OpenAIO1Mini(),
-    Gpt4Turbo(),
-    Llama2Chat13B(),
-    Llama3p1Instruct8B(),
-    Llama3p1Instruct70B(),
-    Llama3p1Instruct405B(),
-    Mistral7B(),
-    Mixtral8x7B(),
-    Claude3Haiku(),
-    Claude3p5Haiku(),
-    Claude3Sonnet(),
-    Claude3p5Sonnet(),
-    Claude3p5SonnetV2(),
-    Claude3Opus(),
-]
-
-DEFAULT_USE_MODELS = [
-    Gpt4Omni(),
-    Gpt4OmniMini(),
-    Gpt4Turbo(),
-    OpenAIO1Preview(),
-    OpenAIO1Mini(),
-    Claude3Haiku(),
-    Claude3p5Haiku(),
-    Claude3p5Sonnet(),
-    Claude3p5SonnetV2(),
-    Claude3Opus(),
-]
+# the model lists are built on first use rather than at import; `ALL_MODELS` / `DEFAULT_USE_MODELS` remain
+# available as module attributes via __getattr__ below
+@lru_cache(maxsize=1)
+def get_all_models() -> tuple[CompletionModel, ...]:
+    return (
+        Gpt3p5Turbo(),
+        Gpt4Omni(),
+        Gpt4OmniMini(),
+        Gpt4Turbo(),
+        OpenAIO1Preview(),
+        OpenAIO1Mini(),
+        Gpt4Turbo(),
+        Llama2Chat13B(),
+        Llama3p1Instruct8B(),
+        Llama3p1Instruct70B(),
+        Llama3p1Instruct405B(),
+        Mistral7B(),
+        Mixtral8x7B(),
+        Claude3Haiku(),
+        Claude3p5Haiku(),
+        Claude3Sonnet(),
+        Claude3p5Sonnet(),
+        Claude3p5SonnetV2(),
+        Claude3Opus(),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_default_models(provider: Optional[str] = None) -> tuple[CompletionModel, ...]:
+    """The models a `CompletionHandler` uses when none are specified, optionally only those for one provider."""
+    if provider == "OpenAI":
+        return (Gpt4Omni(), Gpt4OmniMini(), Gpt4Turbo(), OpenAIO1Preview(), OpenAIO1Mini())
+    if provider == "AWS Bedrock":
+        return (Claude3Haiku(), Claude3p5Haiku(), Claude3p5Sonnet(), Claude3p5SonnetV2(), Claude3Opus())
+    return get_default_models("OpenAI") + get_default_models("AWS Bedrock")
+
+
+def __getattr__(name: str):
+    if name == "ALL_MODELS":
+        value = list(get_all_models())
+    elif name == "DEFAULT_USE_MODELS":
+        value = list(get_default_models())
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
@@ -227,6 +227,14 @@ class SessionUsageTracking(UsageStats):
 TrackerTypes = Union[UsageStats, GlobalUsageTracker, DailyUsageTracking, TopicUsageTracking]
 
 
+class StoredPromptPreview(BaseModel):
+    """The small, uncompressed subset of a StoredPromptAndResponse used for listings."""
+
+    resource_id: str
+    source_tag: Optional[str] = None
+    prompt_preview: str = ""  # empty for items stored before previews were written
+
+
 class StoredPromptAndResponse(DynamoDbResource):
     prompt: list[PromptMessage]
     prompt_image_media_ids: dict[int, list[str]] = Field(default_factory=dict)
@@ -234,6 +242,47 @@ class StoredPromptAndResponse(DynamoDbResource):
     resource_config: ClassVar[ResourceConfig] = ResourceConfig(compress_data=True)
     source_tag: Optional[str] = None
 
+    PROMPT_PREVIEW_LENGTH: ClassVar[int] = 25
+    PREVIEW_ATTRIBUTES: ClassVar[tuple[str, ...]] = ("preview_source_tag", "prompt_preview")
+
+    def to_dynamodb_item(self) -> dict:
+        # the item data is compressed, so write a short preview next to it as plain attributes;
+        # listings can then project just these (see `list_previews`) instead of reading entire prompts
+        base = super().to_dynamodb_item()
+        base["prompt_preview"] = self.prompt[-1].content[: self.PROMPT_PREVIEW_LENGTH] if self.prompt else ""
+        if self.source_tag:
+            base["preview_source_tag"] = self.source_tag
+        return base
+
+    @classmethod
+    def list_previews(
+        cls, memory: DynamoDbMemory, results_limit: int = 25, pagination_key: Optional[dict] = None
+    ) -> tuple[list[StoredPromptPreview], Optional[dict]]:
+        """List previews newest-first, reading only the preview attributes from DynamoDB.
+
+        Returns the previews and the key to supply as `pagination_key` for the next page (None when exhausted).
+        """
+        query_kwargs = {
+            "IndexName": "gsitype",
+            "KeyConditionExpression": Key("gsitype").eq(cls.db_get_gsitypepk()),
+            "ProjectionExpression": ", ".join(("pk", "sk", "gsitype", "gsitypesk") + cls.PREVIEW_ATTRIBUTES),
+            "ScanIndexForward": False,
+            "Limit": results_limit,
+        }
+        if pagination_key:
+            query_kwargs["ExclusiveStartKey"] = pagination_key
+        response = memory.dynamodb_table.query(**query_kwargs)
+        key_prefix = f"{cls.get_unique_key_prefix()}#"
+        previews = [
+            StoredPromptPreview(
+                resource_id=item["pk"].removeprefix(key_prefix),
+                source_tag=item.get("preview_source_tag"),
+                prompt_preview=item.get("prompt_preview", ""),
+            )
+            for item in response["Items"]
+        ]
+        return previews, response.get("LastEvaluatedKey")
+
     @classmethod
     def create_from_prompt_and_response(
         cls,
@@ -288,11 +337,16 @@ class CompletionTracker(object):
         self.store_prompt_images_media_manager = store_prompt_images_media_manager
         self.store_source_tag = store_source_tag
         self.logger = logger
+        self._fixed_up_tracker_ids: set[int] = set()
 
     def fixup_trackers(self):
+        # each tracker only needs checking once; this makes it cheap to call on every streamlit rerun
         for tracker in self.trackers:
+            if id(tracker) in self._fixed_up_tracker_ids:
+                continue
             if not tracker.cached_input_tokens_by_model and isinstance(tracker, DynamoDbResource):
                 self.memory.update_existing(tracker, {"cached_input_tokens_by_model": {}})
+            self._fixed_up_tracker_ids.add(id(tracker))
 
     def track_completion(
         self,
@@ -1,8 +1,9 @@
 # streamlit helpers for ChatAgent
+import asyncio
 import datetime
 import json
 import time
-from base64 import b64decode, b64encode
+from contextlib import contextmanager
 from typing import TYPE_CHECKING, Callable, Optional
 
 import streamlit as st
@@ -170,8 +171,12 @@ class ChatAgentUtils(object):
                     st.write(output)
             return command, output
 
-    def add_user_message(self, msg: str, images: Optional[list[UploadedFile]] = None) -> bool:
-        """Returns true if the streamlit app should reload."""
+    def add_user_message(self, msg: str, images: Optional[list[UploadedFile | dict]] = None) -> bool:
+        """Returns true if the streamlit app should reload.
+
+        Images may be supplied as UploadedFile objects, or as dicts with "name", "type" (mime type) and "data" (bytes)
+        keys, which avoids holding on to the UploadedFile between reruns.
+        """
         if msg.startswith("/"):
             if not (self.use_system_slash_cmds or self.extra_slash_cmds):
                 raise RuntimeError("No slash commands available!")
@@ -189,10 +194,14 @@ class ChatAgentUtils(object):
             return executed_command.refresh_after
         else:
             if images:
+                images = [
+                    {"name": x.name, "type": x.type, "data": x.getvalue()} if isinstance(x, UploadedFile) else x
+                    for x in images
+                ]
                 prompt = ImagePromptMessage(
                     content=msg,
-                    images=[b64encode(image.getvalue()).decode() for image in images],
-                    image_formats=["png" if image.name.endswith("png") else "jpeg" for image in images],  # noqa
+                    images=[image["data"] for image in images],
+                    image_formats=[_image_format(image) for image in images],  # noqa
                 )
             else:
                 prompt = msg
@@ -200,34 +209,58 @@ class ChatAgentUtils(object):
             return True
 
     def display_chat_and_run_agent(self, include_function_calls):
-        num_chat_before = len(self.chat_agent.get_chat_history(include_function_calls=include_function_calls))
+        num_chat_before = self._display_chat_history(include_function_calls)
+
+        if self.chat_agent.working:
+            with self._agent_status() as status_callback_fn:
+                # Run the agent loop, passing the callback function
+                while self.chat_agent.working:
+                    self.chat_agent.run_agent(status_callback_fn=status_callback_fn)
+                    time.sleep(0.05)
+
+        self._display_new_messages(include_function_calls, num_chat_before)
+
+    async def adisplay_chat_and_run_agent(self, include_function_calls):
+        """Same as `display_chat_and_run_agent`, but drives the agent with `ChatAgent.arun_agent`, so the tool
+        calls from a single turn run concurrently. Call from a streamlit script via `asyncio.run(...)`."""
+        num_chat_before = self._display_chat_history(include_function_calls)
+
+        if self.chat_agent.working:
+            with self._agent_status() as status_callback_fn:
+                while self.chat_agent.working:
+                    await self.chat_agent.arun_agent(status_callback_fn=status_callback_fn)
+                    await asyncio.sleep(0.05)
+
+        self._display_new_messages(include_function_calls, num_chat_before)
 
-        for msg in self.chat_agent.get_chat_history(include_function_calls=include_function_calls):
+    def _display_chat_history(self, include_function_calls) -> int:
+        chat_history = self.chat_agent.get_chat_history(include_function_calls=include_function_calls)
+        for msg in chat_history:
             with st.chat_message(msg.role):
                 if isinstance(msg, ImagePromptMessage):
                     main, images = st.columns((90, 10))
                     with main:
                         self.display_chat_msg(msg.content)
-                    for x in msg.images:
-                        images.image(b64decode(x.encode()))
+                    for x in msg.image_bytes:
+                        images.image(x)
                 else:
                     self.display_chat_msg(msg.content)
+        return len(chat_history)
 
-        if self.chat_agent.working:
-            with st.status("Agent working...", expanded=True) as status:
-                # Define the callback function within the scope of `status`
-                def status_callback_fn(message):
-                    status.update(label=f"Agent working... {message}", state="running")
-                    st.write(message)
+    @contextmanager
+    def _agent_status(self):
+        with st.status("Agent working...", expanded=True) as status:
+            # Define the callback function within the scope of `status`
+            def status_callback_fn(message):
+                status.update(label=f"Agent working... {message}", state="running")
+                st.write(message)
 
-                # Run the agent loop, passing the callback function
-                while self.chat_agent.working:
-                    self.chat_agent.run_agent(status_callback_fn=status_callback_fn)
-                    time.sleep(0.05)
+            yield status_callback_fn
 
-                # Final status update when the agent completes
-                status.update(label="Agent completed work!", state="complete", expanded=False)
+            # Final status update when the agent completes
+            status.update(label="Agent completed work!", state="complete", expanded=False)
 
+    def _display_new_messages(self, include_function_calls, num_chat_before: int):
         # output any new messages
         for msg in self.chat_agent.get_chat_history(include_function_calls=include_function_calls)[num_chat_before:]:
             with st.chat_message(msg.role):
@@ -295,6 +328,12 @@ class ChatAgentUtils(object):
         return _d()
 
 
+def _image_format(image: dict) -> str:
+    if image.get("type"):
+        return "png" if image["type"] == "image/png" else "jpeg"
+    return "png" if image["name"].endswith("png") else "jpeg"
+
+
 @st.cache_data
 def get_media_preview(_media_manager: "MediaManager", media_id):
     return _media_manager.retrieve_media_preview(media_id)
@@ -343,8 +382,8 @@ def display_completion(
                             st.write(msg.content)
                         if isinstance(msg, ImagePromptMessage):
                             cols = iter(st.columns(len(msg.images)))
-                            for x in msg.images:
-                                next(cols).image(b64decode(x.encode()))
+                            for x in msg.image_bytes:
+                                next(cols).image(x)
                         if is_stored_par:
                             if idx in par.prompt_image_media_ids:
                                 st.caption("This message included image content")
@@ -0,0 +1,60 @@
+"""Process-wide agent/handler factories shared by the streamlit pages.
+
+`st.cache_resource` caches per decorated function, so defining these once here (rather than on each page)
+lets every page that asks for the default agent reuse the same instance.
+"""
+
+from typing import TYPE_CHECKING
+
+import streamlit as st
+
+# the llm modules are heavy to import; defer them until an agent/handler is actually built
+if TYPE_CHECKING:
+    from supersullytools.llm.agent import ChatAgent
+    from supersullytools.llm.completions import CompletionHandler
+    from supersullytools.llm.trackers import SessionUsageTracking
+
+
+@st.cache_resource
+def get_session_usage_tracker() -> "SessionUsageTracking":
+    from supersullytools.llm.trackers import SessionUsageTracking
+
+    return SessionUsageTracking()
+
+
+@st.cache_resource
+def get_default_completion_handler(
+    topics: tuple[str, ...] = ("AIChat",), tag: str = "supersullytools"
+) -> "CompletionHandler":
+    from supersullytools.utils.common_init import get_standard_completion_handler
+
+    return get_standard_completion_handler(
+        include_session_tracker=False,
+        extra_trackers=[get_session_usage_tracker()],
+        store_source_tag=tag,
+        topics=list(topics),
+    )
+
+
+@st.cache_resource
+def get_tracking_completion_handler() -> "CompletionHandler":
+    """A handler for pages that only read its trackers (e.g. to show costs), with no topic or source tag."""
+    from supersullytools.utils.common_init import get_standard_completion_handler
+
+    return get_standard_completion_handler(include_session_tracker=False, extra_trackers=[get_session_usage_tracker()])
+
+
+@st.cache_resource
+def get_default_agent(topics: tuple[str, ...] = ("AIChat",), tag: str = "supersullytools") -> "ChatAgent":
+    from logzero import logger
+
+    from supersullytools.llm.agent import ChatAgent
+    from supersullytools.llm.agent_tools.duckduckgo import get_ddg_tools
+
+    return ChatAgent(
+        agent_description="You are a helpful assistant.",
+        logger=logger,
+        completion_handler=get_default_completion_handler(topics, tag),
+        tool_profiles={"all": get_ddg_tools()},
+        max_parallel_tool_calls=4,
+    )
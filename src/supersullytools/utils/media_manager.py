@@ -20,28 +20,33 @@ Functions:
         Resizes an image to fit within the specified maximum dimensions while maintaining the aspect ratio.
 
     generate_image_thumbnail(file_obj: IOBase, size: (int, int) = (200, 200)) -> bytes:
-        Generates a thumbnail image from the provided image file object.
+        Generates a (WebP) thumbnail image from the provided image file object.
 
     generate_audio_waveform(file_obj: IOBase) -> bytes:
         Generates a waveform image from the provided audio file object.
 
     generate_pdf_preview(file_obj: IOBase) -> bytes:
-        Generates a preview image from the first page of the provided PDF file object.
+        Generates a (lossless WebP) preview image from the first page of the provided PDF file object.
 
     generate_video_thumbnail(file_obj: IOBase) -> bytes:
         Generates a thumbnail image from the provided video file object using ffmpeg.
 
+    generate_video_thumbnails(file_obj: IOBase, timestamps: list[float], size=(200, 200)) -> list[bytes]:
+        Generates a thumbnail at each timestamp of the provided video file object, in a single ffmpeg pass.
+
+    preview_content_type_of(preview_bytes: bytes) -> Optional[str]:
+        Returns the MIME type (image/webp, image/png or image/jpeg) of a generated preview.
+
     generate_no_preview_available() -> bytes:
         Generates a "No Preview Available" image for unsupported media types or when preview generation fails.
 
 Dependencies:
     - boto3: For interacting with Amazon S3.
-    - gzip: For gzip compression and decompression.
-    - matplotlib: For generating audio waveform images.
-    - PIL (Pillow): For image processing.
+    - zlib: For gzip compression and decompression.
+    - numpy: For generating audio waveform images.
+    - PIL (Pillow): For image processing; pillow-simd can be installed in its place for faster resizing.
     - pydantic: For data validation and settings management.
     - simplesingletable: For interacting with DynamoDB.
-    - smart_open: For reading and writing files from/to S3.
     - pydub: For audio file manipulation (optional).
     - pypdfium2: For PDF file manipulation (optional).
     - cryptography: For encryption and decryption of media files (optional).
@@ -61,12 +66,12 @@ Usage:
     media_manager.delete_media('media_id')
 
 Encryption:
-    To use encryption features, the `cryptography` library must be installed. You can generate a Fernet key
-    and use it for encryption and decryption as shown below:
+    To use encryption features, the `cryptography` library must be installed. Contents are encrypted with AES-GCM,
+    so generate an AES key and use it for encryption and decryption as shown below:
 
-    # Generate a Fernet key
-    from cryptography.fernet import Fernet
-    encryption_key = Fernet.generate_key()
+    # Generate an AES key
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    encryption_key = AESGCM.generate_key(bit_length=256)
 
     # Initialize the MediaManager with encryption
     media_manager = MediaManager(bucket_name='your-bucket-name', logger=your_logger, dynamodb_memory=your_dynamodb_memory)
@@ -83,30 +88,43 @@ Conditional Import:
     raised when attempting to use encryption or decryption features.
 """
 
-import gzip
 import os
 import secrets
+import shutil
+import stat
 import subprocess
 import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import suppress
 from enum import Enum
+from functools import lru_cache
 from io import BytesIO, IOBase
-from typing import IO, ClassVar, Optional
+from typing import IO, TYPE_CHECKING, ClassVar, Iterator, MutableMapping, Optional
 
-import boto3
 from humanize import naturalsize
 from pydantic import ConfigDict, computed_field
 from simplesingletable import DynamoDbMemory, DynamoDbResource
 
 from supersullytools.utils.misc import date_id
 
+# boto3 is only needed once a client / transfer config is actually built
+if TYPE_CHECKING:
+    from boto3.s3.transfer import TransferConfig
+
 try:
-    # from cryptography.fernet import Fernet
-    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 
     CRYPTOGRAPHY_AVAILABLE = True
 except ImportError:
     CRYPTOGRAPHY_AVAILABLE = False
 
+# chunk size used when streaming file contents through gzip / encryption
+STREAM_CHUNK_SIZE = 8 * 1024 * 1024
+
 
 class MediaType(str, Enum):
     pdf = "pdf"
@@ -121,15 +139,14 @@ class MediaType(str, Enum):
 class StoredMedia(DynamoDbResource):
     src_filename: Optional[str] = None
     media_type: MediaType
-    file_size_bytes: int = None  # raw size of uploaded media file
-    storage_size_bytes: int = None  # size of the file being sent to storage (possibly compressed / encrypted)
-    preview_size_bytes: int = None  # raw size of the preview file
-    preview_storage_size_bytes: int = (
-        None  # size of the preview being sent to storage (possibly compressed / encrypted)
-    )
+    file_size_bytes: Optional[int] = None  # raw size of uploaded media file
+    storage_size_bytes: Optional[int] = None  # size of the file being sent to storage (possibly compressed / encrypted)
+    preview_size_bytes: Optional[int] = None  # raw size of the preview file; unset until the preview is generated
+    preview_storage_size_bytes: Optional[int] = None  # size of the preview being sent to storage (possibly encrypted)
     content_gzipped: bool = False
     content_encrypted: bool = False
     preview_encrypted: bool = False
+    preview_content_type: Optional[str] = None  # e.g. image/webp; unset for media stored before this was recorded
 
     model_config: ClassVar[ConfigDict] = ConfigDict(extra="ignore")
 
@@ -173,6 +190,16 @@ class MediaManager:
         logger (logging.Logger): Logger instance for logging information and errors.
         dynamodb_memory (DynamoDbMemory): Instance for interacting with DynamoDB to store and retrieve metadata.
         global_prefix (str): A prefix that is pre-pended to the file IDs when reading/writing to S3.
+        s3_client: The boto3 S3 client used for all transfers; by default, one client shared by every MediaManager.
+        transfer_config (TransferConfig): Multipart thresholds / concurrency for uploads and large downloads.
+        preview_cache_size (int): How many retrieved previews are kept in memory (LRU); 0 disables the cache.
+        metadata_cache_size (int): How many retrieved metadata items are kept in memory (LRU); 0 (the default)
+            disables the cache. Nothing invalidates it across processes, so with it enabled, changes made elsewhere
+            (e.g. deletes, or previews generated by another worker) can be missed for up to `metadata_cache_ttl`.
+        metadata_cache_ttl (float): How long, in seconds, a cached metadata item is used before being read again.
+        shared_metadata_cache (MutableMapping): Optional dict-like cache (e.g. a `cachetools.TTLCache`, or a mapping
+            backed by redis / ElastiCache) of metadata json, written through on upload and read before DynamoDB;
+            expiry is left to the mapping.
 
     Methods:
         generate_preview(file_obj: IOBase, media_type: MediaType) -> bytes:
@@ -183,13 +210,16 @@ class MediaManager:
 
         upload_new_media(source_file_name: str, media_type: MediaType, file_obj: IOBase, use_gzip: bool = False) -> StoredMedia:
             Uploads a new media file to S3, generates a preview, and stores metadata in DynamoDB.
-            Supports optional gzip compression.
+            Supports optional gzip compression, and generating the preview in the background or on first retrieval.
 
         delete_media(media_id: str) -> None:
             Deletes a media file and its preview from S3 and removes the associated metadata from DynamoDB.
 
         retrieve_metadata(media_id: str) -> StoredMedia:
-            Retrieves the metadata for a given media ID from DynamoDB.
+            Retrieves the metadata for a given media ID from DynamoDB (or the in-memory metadata cache).
+
+        invalidate(media_id: str) -> None:
+            Drops any cached metadata / previews for the given media ID.
 
         retrieve_media_metadata_and_contents(media_id: str) -> tuple[StoredMedia, IO[bytes]]:
             Retrieves both the metadata and the content of a media file from S3 and DynamoDB.
@@ -197,6 +227,9 @@ class MediaManager:
         retrieve_media_contents(media_id: str) -> IO[bytes]:
             Retrieves the content of a media file from S3.
 
+        iter_media_contents(media_id: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+            Streams the content of a media file from S3 in chunks.
+
         retrieve_media_preview(media_id: str) -> bytes:
             Retrieves the preview image of a media file from S3.
 
@@ -204,12 +237,48 @@ class MediaManager:
             Generates a presigned download URL for the specified media file.
     """
 
-    def __init__(self, bucket_name: str, logger, dynamodb_memory, global_prefix: str = ""):
+    def __init__(
+        self,
+        bucket_name: str,
+        logger,
+        dynamodb_memory,
+        global_prefix: str = "",
+        transfer_config: Optional["TransferConfig"] = None,
+        s3_client=None,
+        preview_cache_size: int = 256,
+        metadata_cache_size: int = 0,
+        metadata_cache_ttl: float = 60,
+        shared_metadata_cache: Optional[MutableMapping[str, str]] = None,
+    ):
         self.bucket_name = bucket_name
         self.logger = logger
         self.dynamodb_memory: DynamoDbMemory = dynamodb_memory
         self.global_prefix = global_prefix.rstrip("/") + "/" if global_prefix else ""
-        self.s3_client = boto3.client("s3")
+        # keys have always been built as "/".join([global_prefix, media_id]).replace("//", "/"), which gives a leading
+        # slash when there is no prefix; keep producing exactly those keys so existing media stays reachable
+        self._key_prefix = self.global_prefix or "/"
+        self.s3_client = s3_client or _get_default_s3_client()
+        # files over the threshold are transferred as concurrent multipart uploads / ranged downloads
+        if transfer_config is None:
+            from boto3.s3.transfer import TransferConfig
+
+            transfer_config = TransferConfig(
+                multipart_threshold=8 * 1024 * 1024, multipart_chunksize=16 * 1024 * 1024, max_concurrency=8
+            )
+        self.transfer_config = transfer_config
+        # previews never change once written (media ids are never reused), so listings that show the same previews
+        # repeatedly can be answered from memory
+        self.preview_cache_size = preview_cache_size
+        self._preview_cache: OrderedDict[tuple[str, Optional[bytes]], bytes] = OrderedDict()
+        # metadata is read on every retrieval / deletion; opt-in, since a cached item can be up to ttl seconds stale
+        # with respect to changes made by other processes
+        self.metadata_cache_size = metadata_cache_size
+        self.metadata_cache_ttl = metadata_cache_ttl
+        self._metadata_cache: OrderedDict[str, tuple[float, StoredMedia]] = OrderedDict()
+        # an optional second tier, checked before DynamoDB, that can be shared between processes (values are json)
+        self.shared_metadata_cache = shared_metadata_cache
+        self._pending_previews: dict[str, Future] = {}
+        self._cache_lock = threading.Lock()
 
     def generate_preview(self, file_obj: IOBase, media_type: MediaType) -> bytes:
         try:
@@ -217,49 +286,56 @@ class MediaManager:
         except KeyError:
             raise ValueError(f"Invalid media type: {media_type}. Valid types are: {', '.join(list(MediaType))}")
 
-        try:
-            if media_type == MediaType.image:
-                return generate_image_thumbnail(file_obj)
-            elif media_type == MediaType.audio:
-                return generate_audio_waveform(file_obj)
-            elif media_type == MediaType.video:
-                return generate_video_thumbnail(file_obj)
-            elif media_type == MediaType.pdf:
-                return generate_pdf_preview(file_obj)
-        except:  # noqa
-            self.logger.exception("Error generating preview")
+        generator = _PREVIEW_GENERATORS.get(media_type)
+        if generator is not None:
+            try:
+                return generator(file_obj)
+            except:  # noqa
+                self.logger.exception("Error generating preview")
         return generate_no_preview_available()
 
     def list_available_media(self, num: int = 10, oldest_first: bool = True, pagination_key: Optional[str] = None):
+        # a Query against simplesingletable's `gsitype` index (partitioned by resource type, sorted by updated time),
+        # so listing reads only the StoredMedia page requested, never a Scan of the table
         return self.dynamodb_memory.list_type_by_updated_at(
             StoredMedia, ascending=oldest_first, pagination_key=pagination_key, results_limit=num
         )
 
-    @staticmethod
-    def _encrypt_contents(file_obj: IOBase, encryption_key: bytes) -> IOBase:
-        if not CRYPTOGRAPHY_AVAILABLE:
-            raise ImportError("cryptography library is not available. Install it to use encryption features.")
-
-        file_obj.seek(0)
-        data = file_obj.read()
-        nonce = secrets.token_bytes(12)  # GCM mode needs 12 fresh bytes every time
-        ciphertext = nonce + AESGCM(encryption_key).encrypt(nonce, data, b"")
-        encrypted_io = BytesIO(ciphertext)
-        encrypted_io.seek(0)
-        return encrypted_io
-
     @staticmethod
     def _decrypt_contents(file_obj: IOBase, encryption_key: bytes) -> IOBase:
         if not CRYPTOGRAPHY_AVAILABLE:
             raise ImportError("cryptography library is not available. Install it to use decryption features.")
 
         file_obj.seek(0)
-        ciphertext = file_obj.read()
-        decrypted_data = AESGCM(encryption_key).decrypt(ciphertext[:12], ciphertext[12:], b"")
-        decrypted_io = BytesIO(decrypted_data)
+        nonce = file_obj.read(12)
+        file_obj.seek(-16, 2)
+        tag = file_obj.read(16)
+        remaining = file_obj.tell() - 16 - 12
+        file_obj.seek(12)
+
+        decryptor = Cipher(algorithms.AES(encryption_key), modes.GCM(nonce, tag)).decryptor()
+        decrypted_io = BytesIO()
+        while remaining > 0:
+            chunk = file_obj.read(min(STREAM_CHUNK_SIZE, remaining))
+            remaining -= len(chunk)
+            decrypted_io.write(decryptor.update(chunk))
+        decryptor.finalize()  # raises InvalidTag if the contents or key are wrong; nothing is returned unverified
         decrypted_io.seek(0)
         return decrypted_io
 
+    def _key(self, media_id: str, suffix: str = "") -> str:
+        return f"{self._key_prefix}{media_id}{suffix}"
+
+    def _open_object(self, key: str) -> IO[bytes]:
+        """The (streaming) body of an object, read with a single GET."""
+        return self.s3_client.get_object(Bucket=self.bucket_name, Key=key)["Body"]
+
+    def _read_object(self, key: str) -> bytes:
+        return self._open_object(key).read()
+
+    def _upload_fileobj(self, file_obj: IO[bytes], key: str):
+        self.s3_client.upload_fileobj(file_obj, self.bucket_name, key, Config=self.transfer_config)
+
     def upload_new_media(
         self,
         source_file_name: str,
@@ -268,71 +344,83 @@ class MediaManager:
         use_gzip: bool = False,
         encryption_key: Optional[bytes] = None,
         encrypt_preview: bool = True,
+        generate_preview_now: bool = True,
+        background: bool = False,
     ) -> StoredMedia:
+        """Upload a new media file (and its preview), and store its metadata.
+
+        With `background=True` the preview is generated and uploaded on a worker thread after this returns; with
+        `generate_preview_now=False` it is only generated the first time it is retrieved. Either way, the preview
+        sizes on the returned metadata are unset until the preview exists.
+        """
         try:
             media_type = MediaType[media_type]
         except KeyError:
             raise ValueError(f"Invalid media type: {media_type}. Valid types are: {', '.join(list(MediaType))}")
 
         upload_id = date_id()
-        prefixed_file_name = "/".join([self.global_prefix, upload_id]).replace("//", "/")
+        prefixed_file_name = self._key(upload_id)
+        preview_now = generate_preview_now and not background
 
         try:
-            # Get raw file size
-            file_obj.seek(0, 2)
-            raw_file_size_bytes = file_obj.tell()
+            # the content upload reads `file_obj` as it goes, so the preview is generated from a second, independent
+            # view of in-memory contents (e.g. streamlit uploads; getvalue() usually shares the buffer rather than
+            # copying it) while the upload runs, and beforehand otherwise
+            preview_source = BytesIO(file_obj.getvalue()) if isinstance(file_obj, BytesIO) else None
+            preview_bytes = None
+            if preview_now and preview_source is None:
+                preview_bytes = self.generate_preview(file_obj, media_type)
             file_obj.seek(0)
 
-            # GZIP if requested
+            # GZIP / encrypt if requested; both are applied as the upload reads, so no transformed copy of the
+            # content is ever materialized (in memory or on disk). The reader also counts the bytes on either side,
+            # which gives the raw and storage sizes without seeking to the end of `file_obj`
+            stages = []
             if use_gzip:
-                compressed_io = BytesIO()
-                with gzip.GzipFile(fileobj=compressed_io, mode="wb") as gz:
-                    gz.write(file_obj.read())
-                compressed_io.seek(0)
-                write_obj = compressed_io
-            else:
-                write_obj = file_obj
-
-            # Encrypt if requested
+                stages.append(_GzipStage())
             encrypted = False
             if encryption_key:
                 encrypted = True
-                write_obj = self._encrypt_contents(write_obj, encryption_key)
-
-            # Calculate final storage size after compression/encryption
-            write_obj.seek(0, 2)
-            file_size_bytes = write_obj.tell()
-            write_obj.seek(0)
-
-            # Upload the file to S3
-            self.s3_client.upload_fileobj(write_obj, self.bucket_name, prefixed_file_name)
-
-            self.logger.info(
-                f"Successfully uploaded {source_file_name} to s3://{self.bucket_name}/{prefixed_file_name}"
-            )
-
-            # Generate and upload preview
-            file_obj.seek(0)
-            preview_io = BytesIO(self.generate_preview(file_obj, media_type))
-
-            preview_io.seek(0, 2)
-            raw_preview_size_bytes = preview_io.tell()
-            preview_io.seek(0)
-
-            preview_encrypted = False
-            if encryption_key and encrypt_preview:
-                preview_encrypted = True
-                preview_io = self._encrypt_contents(preview_io, encryption_key)
-
-            preview_io.seek(0, 2)
-            preview_file_size_bytes = preview_io.tell()
-            preview_io.seek(0)
-
-            self.s3_client.upload_fileobj(preview_io, self.bucket_name, f"{prefixed_file_name}_preview")
-
-            self.logger.info(
-                f"Successfully uploaded preview for {source_file_name} to s3://{self.bucket_name}/{prefixed_file_name}_preview"
-            )
+                stages.append(_AesGcmStage(encryption_key))
+            # untransformed contents whose size is known up front are handed to boto3 as-is, which saves a copy of
+            # every chunk and lets it read parts of a seekable file concurrently
+            known_size = None if stages else _known_size(file_obj)
+            write_obj = file_obj if known_size is not None else _TransformingReader(file_obj, stages)
+            preview_encrypted = bool(encryption_key and encrypt_preview)
+            raw_preview_size_bytes = preview_file_size_bytes = preview_content_type = None
+
+            # the content and preview uploads run concurrently, on a pool shared by every MediaManager
+            executor = _get_io_executor()
+            content_upload = executor.submit(self._upload_fileobj, write_obj, prefixed_file_name)
+            preview_upload = None
+            try:
+                if preview_now:
+                    if preview_bytes is None:
+                        preview_bytes = self.generate_preview(preview_source, media_type)
+                    raw_preview_size_bytes = len(preview_bytes)
+                    preview_content_type = preview_content_type_of(preview_bytes)
+                    stored_preview = self._prepare_preview(preview_bytes, encryption_key if preview_encrypted else None)
+                    preview_file_size_bytes = len(stored_preview)
+                    preview_upload = executor.submit(self._put_preview, upload_id, stored_preview)
+
+                content_upload.result()
+                if known_size is not None:
+                    raw_file_size_bytes = file_size_bytes = known_size
+                else:
+                    # otherwise the sizes are only known once the upload has read everything
+                    raw_file_size_bytes = write_obj.bytes_read
+                    file_size_bytes = write_obj.bytes_written
+                self.logger.info(
+                    f"Successfully uploaded {source_file_name} to s3://{self.bucket_name}/{prefixed_file_name}"
+                )
+                if preview_upload is not None:
+                    preview_upload.result()
+                    self.logger.info(
+                        f"Successfully uploaded preview for {source_file_name} to s3://{self.bucket_name}/{prefixed_file_name}_preview"
+                    )
+            finally:
+                # if anything above failed, don't return while an upload is still reading `file_obj`
+                wait([x for x in (content_upload, preview_upload) if x is not None])
 
             # Create and store the media metadata
             metadata = self.dynamodb_memory.create_new(
@@ -347,43 +435,85 @@ class MediaManager:
                     "content_gzipped": use_gzip,
                     "content_encrypted": encrypted,
                     "preview_encrypted": preview_encrypted,
+                    "preview_content_type": preview_content_type,
                 },
                 override_id=upload_id,
             )
-            return metadata
+            self._cache_metadata(metadata)
         except Exception as e:
             self.logger.exception(
                 f"Failed to upload {source_file_name} to s3://{self.bucket_name}/{prefixed_file_name}: {str(e)}"
             )
             raise
 
+        if generate_preview_now and background:
+            # the caller may close `file_obj` once this returns, so anything but in-memory contents is read back
+            # from S3 for the preview
+            future = _get_preview_executor().submit(self._create_preview, metadata, encryption_key, preview_source)
+            with self._cache_lock:
+                self._pending_previews[upload_id] = future
+            future.add_done_callback(lambda _: self._pending_previews.pop(upload_id, None))
+        return metadata
+
+    @staticmethod
+    def _prepare_preview(preview_bytes: bytes, encryption_key: Optional[bytes]) -> bytes:
+        if not encryption_key:
+            return preview_bytes
+        # previews are small, so they are encrypted in one go
+        encryption = _AesGcmStage(encryption_key)
+        return encryption.update(preview_bytes) + encryption.finish()
+
+    def _put_preview(self, media_id: str, stored_preview: bytes):
+        self.s3_client.put_object(Bucket=self.bucket_name, Key=self._key(media_id, "_preview"), Body=stored_preview)
+
+    def _create_preview(
+        self, metadata: StoredMedia, encryption_key: Optional[bytes], source: Optional[IOBase] = None
+    ) -> bytes:
+        """Generate, store and record the preview of already uploaded media; returns the (unencrypted) preview."""
+        if metadata.preview_encrypted and not encryption_key:
+            raise ValueError("Preview is encrypted; you must supply an encryption key.")
+        try:
+            if source is None:
+                source = self.retrieve_media_contents(metadata.resource_id, encryption_key, metadata=metadata)
+            preview_bytes = self.generate_preview(source, metadata.media_type)
+            stored_preview = self._prepare_preview(
+                preview_bytes, encryption_key if metadata.preview_encrypted else None
+            )
+            self._put_preview(metadata.resource_id, stored_preview)
+            updated = self.dynamodb_memory.update_existing(
+                metadata,
+                {
+                    "preview_size_bytes": len(preview_bytes),
+                    "preview_storage_size_bytes": len(stored_preview),
+                    "preview_content_type": preview_content_type_of(preview_bytes),
+                },
+            )
+            self._cache_metadata(updated)
+            self.logger.info(f"Successfully generated preview for media ID {metadata.resource_id}")
+            return preview_bytes
+        except Exception as e:
+            self.logger.exception(f"Failed to generate preview for media ID {metadata.resource_id}: {str(e)}")
+            raise
+
     def delete_media(self, media_id: str) -> None:
         metadata = self.retrieve_metadata(media_id)  # Ensure the media exists
-        prefixed_file_name = "/".join([self.global_prefix, media_id]).replace("//", "/")
+        prefixed_file_name = self._key(media_id)
 
         try:
-            # Idempotent deletion of the main file from S3
-            try:
-                self.s3_client.delete_object(Bucket=self.bucket_name, Key=prefixed_file_name)
-                self.logger.info(f"Successfully deleted s3://{self.bucket_name}/{prefixed_file_name}")
-            except self.s3_client.exceptions.ClientError as e:
-                if e.response["Error"]["Code"] == "NoSuchKey":
-                    self.logger.info(
-                        f"s3://{self.bucket_name}/{prefixed_file_name} does not exist or was already deleted"
-                    )
-                else:
-                    raise
-
-            # Idempotent deletion of the preview file from S3
-            preview_key = f"{prefixed_file_name}_preview"
-            try:
-                self.s3_client.delete_object(Bucket=self.bucket_name, Key=preview_key)
-                self.logger.info(f"Successfully deleted s3://{self.bucket_name}/{preview_key}")
-            except self.s3_client.exceptions.ClientError as e:
-                if e.response["Error"]["Code"] == "NoSuchKey":
-                    self.logger.info(f"s3://{self.bucket_name}/{preview_key} does not exist or was already deleted")
-                else:
-                    raise
+            # Idempotent deletion of the main file and its preview from S3, in a single request; deleting a key
+            # that does not exist is not an error for S3
+            preview_key = self._key(media_id, "_preview")
+            response = self.s3_client.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={"Objects": [{"Key": prefixed_file_name}, {"Key": preview_key}], "Quiet": True},
+            )
+            errors = [x for x in response.get("Errors", []) if x.get("Code") != "NoSuchKey"]
+            if errors:
+                raise RuntimeError(
+                    "Failed to delete "
+                    + ", ".join(f"s3://{self.bucket_name}/{x['Key']} ({x['Code']}: {x.get('Message')})" for x in errors)
+                )
+            self.logger.info(f"Successfully deleted s3://{self.bucket_name}/{prefixed_file_name} and its preview")
 
             # Delete the metadata from DynamoDB
             self.dynamodb_memory.delete_existing(metadata)
@@ -391,15 +521,71 @@ class MediaManager:
         except Exception as e:
             self.logger.exception(f"Failed to delete media ID {media_id}: {str(e)}")
             raise
+        finally:
+            self.invalidate(media_id)
+
+    def invalidate(self, media_id: str) -> None:
+        """Drop any cached metadata / previews for the media ID, e.g. after it was changed by another process."""
+        with self._cache_lock:
+            self._metadata_cache.pop(media_id, None)
+            for cache_key in [x for x in self._preview_cache if x[0] == media_id]:
+                del self._preview_cache[cache_key]
+        if self.shared_metadata_cache is not None:
+            try:
+                self.shared_metadata_cache.pop(media_id, None)
+            except Exception:
+                self.logger.exception(f"Failed to remove media ID {media_id} from the shared metadata cache")
 
     def retrieve_metadata(self, media_id: str) -> StoredMedia:
+        with self._cache_lock:
+            entry = self._metadata_cache.get(media_id)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._metadata_cache[media_id]
+                entry = None
+            if entry is not None:
+                self._metadata_cache.move_to_end(media_id)
+                return entry[1].model_copy()  # a copy, so callers can't modify the cached item
+
+        if (metadata := self._read_shared_metadata(media_id)) is not None:
+            self._cache_metadata(metadata, shared=False)
+            return metadata
+
         try:
             metadata = self.dynamodb_memory.read_existing(media_id, StoredMedia)
             self.logger.info(f"Successfully retrieved metadata for media ID {media_id}")
-            return metadata
         except Exception as e:
             self.logger.exception(f"Failed to retrieve metadata for media ID {media_id}: {str(e)}")
             raise
+        self._cache_metadata(metadata)
+        return metadata
+
+    def _read_shared_metadata(self, media_id: str) -> Optional[StoredMedia]:
+        # the shared cache is only an optimization; if it is unavailable, read from DynamoDB as usual
+        if self.shared_metadata_cache is None:
+            return None
+        try:
+            cached = self.shared_metadata_cache.get(media_id)
+            return StoredMedia.model_validate_json(cached) if cached else None
+        except Exception:
+            self.logger.exception(f"Failed to read media ID {media_id} from the shared metadata cache")
+            return None
+
+    def _cache_metadata(self, metadata: StoredMedia, shared: bool = True) -> None:
+        if shared and self.shared_metadata_cache is not None:
+            try:
+                self.shared_metadata_cache[metadata.resource_id] = metadata.model_dump_json()
+            except Exception:
+                self.logger.exception(f"Failed to write media ID {metadata.resource_id} to the shared metadata cache")
+        if self.metadata_cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._metadata_cache[metadata.resource_id] = (
+                time.monotonic() + self.metadata_cache_ttl,
+                metadata.model_copy(),
+            )
+            self._metadata_cache.move_to_end(metadata.resource_id)
+            while len(self._metadata_cache) > self.metadata_cache_size:
+                self._metadata_cache.popitem(last=False)
 
     def retrieve_media_metadata_and_contents(
         self, media_id: str, encryption_key: Optional[bytes] = None
@@ -412,29 +598,37 @@ class MediaManager:
         self, media_id: str, encryption_key: Optional[bytes] = None, metadata: Optional[StoredMedia] = None
     ) -> IO[bytes]:
         metadata = metadata or self.retrieve_metadata(media_id)
-        prefixed_file_name = "/".join([self.global_prefix, media_id]).replace("//", "/")
+        prefixed_file_name = self._key(media_id)
 
         if metadata.content_encrypted and not encryption_key:
             raise ValueError("Content is encrypted; you must supply an encryption key.")
 
         try:
-            s3_response = self.s3_client.get_object(Bucket=self.bucket_name, Key=prefixed_file_name)
-            contents = s3_response["Body"].read()
+            if metadata.content_gzipped and not metadata.content_encrypted:
+                # decompress straight off the response stream; the compressed bytes are never held whole
+                output_data = _gunzip(self._open_object(prefixed_file_name))
+                self.logger.info(f"Successfully retrieved contents for media ID {media_id}")
+                return output_data
+
+            if (metadata.storage_size_bytes or 0) > self.transfer_config.multipart_threshold:
+                # large files are fetched with concurrent ranged GETs; small ones with a single GET, which
+                # avoids the extra HEAD request download_fileobj makes
+                output_data = BytesIO()
+                self.s3_client.download_fileobj(
+                    self.bucket_name, prefixed_file_name, output_data, Config=self.transfer_config
+                )
+                output_data.seek(0)
+            else:
+                output_data = BytesIO(self._read_object(prefixed_file_name))
             self.logger.info(f"Successfully retrieved contents for media ID {media_id}")
 
-            output_data = BytesIO(contents)
-
             # Decrypt if needed
             if metadata.content_encrypted:
                 output_data = self._decrypt_contents(file_obj=output_data, encryption_key=encryption_key)
 
             # Decompress if gzipped
             if metadata.content_gzipped:
-                decompressed_io = BytesIO()
-                with gzip.GzipFile(fileobj=output_data, mode="rb") as gz:
-                    decompressed_io.write(gz.read())
-                decompressed_io.seek(0)
-                output_data = decompressed_io
+                output_data = _gunzip(output_data)
 
             return output_data
 
@@ -442,27 +636,80 @@ class MediaManager:
             self.logger.exception(f"Failed to retrieve contents for media ID {media_id}: {str(e)}")
             raise
 
+    def iter_media_contents(
+        self,
+        media_id: str,
+        encryption_key: Optional[bytes] = None,
+        metadata: Optional[StoredMedia] = None,
+        chunk_size: int = 1024 * 1024,
+    ) -> Iterator[bytes]:
+        """Yield the contents of a media file in chunks, without holding the whole file in memory.
+
+        Useful for streaming a response. Encrypted contents are the exception: their authentication tag can only be
+        checked once everything is read, so they are retrieved (and verified) in full before the first chunk.
+        """
+        metadata = metadata or self.retrieve_metadata(media_id)
+
+        if metadata.content_encrypted:
+            contents = self.retrieve_media_contents(media_id, encryption_key, metadata=metadata)
+            yield from iter(lambda: contents.read(chunk_size), b"")
+            return
+
+        try:
+            body = self._open_object(self._key(media_id))
+            if metadata.content_gzipped:
+                yield from (x for x in _iter_gunzip(body, chunk_size) if x)
+            else:
+                yield from iter(lambda: body.read(chunk_size), b"")
+            self.logger.info(f"Successfully streamed contents for media ID {media_id}")
+        except Exception as e:
+            self.logger.exception(f"Failed to stream contents for media ID {media_id}: {str(e)}")
+            raise
+
     def retrieve_media_preview(self, media_id: str, encryption_key: Optional[bytes] = None):
         # If the preview is encrypted but no key is supplied, the preview data will fail to decrypt
         # or yield a corrupted preview. You may want to handle that case specifically.
-        prefixed_file_name = "/".join([self.global_prefix, media_id]).replace("//", "/")
-        preview_key = f"{prefixed_file_name}_preview"
+        preview_key = self._key(media_id, "_preview")
+
+        cache_key = (media_id, encryption_key)
+        with self._cache_lock:
+            if (cached := self._preview_cache.get(cache_key)) is not None:
+                self._preview_cache.move_to_end(cache_key)
+                return cached
+            pending = self._pending_previews.get(media_id)
+        if pending is not None:
+            # generated in the background at upload; any failure there was already logged
+            with suppress(Exception):
+                pending.result()
 
         try:
-            s3_response = self.s3_client.get_object(Bucket=self.bucket_name, Key=preview_key)
-            contents = s3_response["Body"].read()
+            contents = self._read_object(preview_key)
             self.logger.info(f"Successfully retrieved preview contents for media ID {media_id}")
 
             if encryption_key:
                 # Attempt to decrypt if the preview is encrypted
                 # (No explicit metadata check here, but you could retrieve it if needed)
                 decrypted = self._decrypt_contents(BytesIO(contents), encryption_key)
-                return decrypted.read()
-
-            return contents
+                contents = decrypted.read()
         except Exception as e:
-            self.logger.exception(f"Failed to retrieve preview contents for media ID {media_id}: {str(e)}")
-            return generate_no_preview_available()
+            metadata = None
+            with suppress(Exception):
+                metadata = self.retrieve_metadata(media_id)
+            if metadata is None or metadata.preview_size_bytes is not None:
+                self.logger.exception(f"Failed to retrieve preview contents for media ID {media_id}: {str(e)}")
+                return generate_no_preview_available()  # not cached, so a transient failure isn't remembered
+            # the preview was deferred at upload (`generate_preview_now=False`); create it on this first read
+            try:
+                contents = self._create_preview(metadata, encryption_key)
+            except Exception:
+                return generate_no_preview_available()
+
+        if self.preview_cache_size > 0:
+            with self._cache_lock:
+                self._preview_cache[cache_key] = contents
+                while len(self._preview_cache) > self.preview_cache_size:
+                    self._preview_cache.popitem(last=False)
+        return contents
 
     def generate_presigned_download_url(self, media_id: str, expiration: int = 3600, preview_file: bool = False) -> str:
         """
@@ -473,9 +720,7 @@ class MediaManager:
             of the media itself.
         :return: A presigned URL string.
         """
-        prefixed_file_name = "/".join([self.global_prefix, media_id]).replace("//", "/")
-        preview_key = f"{prefixed_file_name}_preview"
-        final_key = preview_key if preview_file else prefixed_file_name
+        final_key = self._key(media_id, "_preview" if preview_file else "")
         try:
             url = self.s3_client.generate_presigned_url(
                 "get_object",
@@ -489,6 +734,170 @@ class MediaManager:
             raise
 
 
+@lru_cache(maxsize=1)
+def _get_io_executor() -> ThreadPoolExecutor:
+    # shared by every MediaManager for the S3 uploads in `upload_new_media`, rather than starting threads per call
+    return ThreadPoolExecutor(max_workers=16, thread_name_prefix="media-io")
+
+
+@lru_cache(maxsize=1)
+def _get_preview_executor() -> ThreadPoolExecutor:
+    # shared by every MediaManager, for previews generated after `upload_new_media(background=True)` returns
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="media-preview")
+
+
+@lru_cache(maxsize=None)
+def _get_default_s3_client(max_pool_connections: int = 32):
+    import boto3
+    from botocore.config import Config
+
+    # shared by every MediaManager that isn't handed a client, so they reuse one kept-alive connection pool; it is
+    # large enough for a content and a preview transfer (each up to `max_concurrency` parts) running at once
+    return boto3.client(
+        "s3",
+        config=Config(
+            max_pool_connections=max_pool_connections,
+            tcp_keepalive=True,
+            retries={"mode": "adaptive", "max_attempts": 5},
+        ),
+    )
+
+
+def _gunzip(file_obj: IO[bytes]) -> BytesIO:
+    decompressed_io = BytesIO()
+    for data in _iter_gunzip(file_obj):
+        decompressed_io.write(data)
+    decompressed_io.seek(0)
+    return decompressed_io
+
+
+def _iter_gunzip(file_obj: IO[bytes], chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    # a plain zlib loop (wbits=31 -> gzip container) over large chunks, the mirror of `_GzipStage`
+    # each yielded piece is at most `chunk_size` bytes, however well the data compressed
+    decompressor = zlib.decompressobj(31)
+    while chunk := file_obj.read(chunk_size):
+        while chunk:
+            yield decompressor.decompress(chunk, chunk_size)
+            chunk = decompressor.unconsumed_tail
+            if decompressor.eof and decompressor.unused_data:  # a following gzip member, as GzipFile would read
+                chunk, decompressor = decompressor.unused_data, zlib.decompressobj(31)
+    while not decompressor.eof and (data := decompressor.decompress(b"", chunk_size)):
+        yield data  # output still pending after the last of the input
+    if not decompressor.eof:
+        raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+
+
+def _known_size(file_obj: IO[bytes]) -> Optional[int]:
+    """The size of `file_obj` if it is available without reading or seeking it, otherwise None."""
+    # e.g. streamlit / django uploaded files
+    size = getattr(file_obj, "size", None)
+    if isinstance(size, int):
+        return size
+    if isinstance(file_obj, BytesIO):
+        with file_obj.getbuffer() as view:
+            return view.nbytes
+    # fileno() would roll a spooled file over to disk
+    if isinstance(file_obj, tempfile.SpooledTemporaryFile):
+        return None
+    with suppress(AttributeError, OSError, ValueError):
+        st = os.fstat(file_obj.fileno())
+        # pipes / sockets report a size of 0
+        if stat.S_ISREG(st.st_mode):
+            return st.st_size
+    return None
+
+
+class _GzipStage:
+    """Streaming gzip compression, for use with `_TransformingReader`."""
+
+    def __init__(self, compresslevel: int = 6):
+        self._compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+
+    def update(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _AesGcmStage:
+    """Streaming AES-GCM encryption, for use with `_TransformingReader`.
+
+    The output is nonce + ciphertext + tag, the same layout `AESGCM.encrypt` produces.
+    """
+
+    def __init__(self, encryption_key: bytes):
+        if not CRYPTOGRAPHY_AVAILABLE:
+            raise ImportError("cryptography library is not available. Install it to use encryption features.")
+        self._nonce = secrets.token_bytes(12)  # GCM mode needs 12 fresh bytes every time
+        self._encryptor = Cipher(algorithms.AES(encryption_key), modes.GCM(self._nonce)).encryptor()
+
+    def _take_nonce(self) -> bytes:
+        nonce, self._nonce = self._nonce, b""
+        return nonce
+
+    def update(self, data: bytes) -> bytes:
+        return self._take_nonce() + self._encryptor.update(data)
+
+    def finish(self) -> bytes:
+        return self._take_nonce() + self._encryptor.finalize() + self._encryptor.tag
+
+
+class _TransformingReader:
+    """Read-only, non-seekable file object that applies `stages` to `source` as it is read.
+
+    Each stage has `update(data) -> bytes` and `finish() -> bytes`; the output of one stage feeds the next.
+    Only about one chunk of the source is held at a time, and `bytes_read` / `bytes_written` count either side.
+    """
+
+    def __init__(self, source: IO[bytes], stages: list, chunk_size: int = STREAM_CHUNK_SIZE):
+        self._source = source
+        self._stages = stages
+        self._chunk_size = chunk_size
+        self._buffer = bytearray()
+        self._finished = False
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        if size is None or size < 0:
+            size = None
+        while not self._finished and (size is None or len(self._buffer) < size):
+            data = self._source.read(self._chunk_size)
+            self.bytes_read += len(data)
+            if data:
+                for stage in self._stages:
+                    data = stage.update(data)
+            else:
+                self._finished = True
+                for stage in self._stages:
+                    data = stage.update(data) + stage.finish()
+            self._buffer += data
+        if size is None:
+            size = len(self._buffer)
+        out = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        self.bytes_written += len(out)
+        return out
+
+
+def preview_content_type_of(preview_bytes: bytes) -> Optional[str]:
+    """The MIME type of a generated preview, from its leading bytes."""
+    if preview_bytes[:4] == b"RIFF" and preview_bytes[8:12] == b"WEBP":
+        return "image/webp"
+    if preview_bytes.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if preview_bytes.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    return None
+
+
 def resize_image(image, max_size: (int, int) = (200, 200)):
     from PIL import Image
 
@@ -500,20 +909,20 @@ def generate_image_thumbnail(file_obj: IOBase, size=(200, 200)) -> bytes:
     from PIL import Image
 
     image = Image.open(file_obj)
+    # thumbnail() on the still-unloaded image lets Pillow draft-decode JPEGs at a reduced scale;
+    # loading or copying the image first would force a full-resolution decode
     image.thumbnail(size)
+    # always WebP, rather than the source format: a PNG (or TIFF, BMP...) thumbnail is several times larger
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.mode or "transparency" in image.info else "RGB")
     thumb_io = BytesIO()
-    # Use a default format (e.g., PNG) if image.format is None
-    fmt = image.format if image.format else "PNG"
-    image.save(thumb_io, format=fmt)
-    thumb_io.seek(0)
-    return thumb_io.read()
+    image.save(thumb_io, format="WEBP", quality=80, method=4)
+    return thumb_io.getvalue()
 
 
 def generate_audio_waveform(file_obj: IOBase) -> bytes:
-    from PIL import Image
-
     try:
-        import matplotlib.pyplot as plt
+        import numpy  # noqa: F401
         from pydub import AudioSegment
         from pydub.exceptions import CouldntDecodeError
     except ImportError:
@@ -528,91 +937,200 @@ def generate_audio_waveform(file_obj: IOBase) -> bytes:
             else:
                 raise
 
-        samples = audio.get_array_of_samples()
+        return _draw_waveform(audio)
+    except Exception as e:
+        raise Exception(f"Failed to generate audio waveform: {str(e)}")
 
-        plt.figure(figsize=(10, 2))
-        plt.plot(samples)
-        plt.axis("off")
 
-        waveform_io = BytesIO()
-        plt.savefig(waveform_io, format="png")
-        plt.close()
-        waveform_io.seek(0)
+def _draw_waveform(audio, width: int = 200, height: int = 40) -> bytes:
+    """Draw the min/max envelope of the audio, one column per pixel."""
+    import numpy as np
+    from PIL import Image, ImageDraw
+
+    dtype = {1: np.int8, 2: np.int16, 4: np.int32}.get(audio.sample_width)
+    if dtype is not None:
+        samples = np.frombuffer(audio.raw_data, dtype=dtype)
+    else:
+        samples = np.array(audio.get_array_of_samples())
+    # one row per frame; the envelope covers every channel, so channels are reduced in place rather than first being
+    # mixed down into a full-length float copy of the samples
+    frames = samples[: len(samples) // audio.channels * audio.channels].reshape(-1, audio.channels)
+    if not len(frames):
+        raise ValueError("No audio samples")
+
+    bucket_starts = np.linspace(0, len(frames), width, endpoint=False).astype(np.int64)
+    maxs = np.maximum.reduceat(frames, bucket_starts, axis=0).max(axis=1).astype(np.float64)
+    mins = np.minimum.reduceat(frames, bucket_starts, axis=0).min(axis=1).astype(np.float64)
+    peak = max(np.abs(maxs).max(), np.abs(mins).max()) or 1.0
+    mid = (height - 1) / 2
+    tops = mid - maxs / peak * mid
+    bottoms = mid - mins / peak * mid
 
-        image = Image.open(waveform_io)
-        image = resize_image(image, max_size=(200, 200))
+    image = Image.new("RGB", (width, height), color=(255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    for x, (top, bottom) in enumerate(zip(tops.tolist(), bottoms.tolist())):
+        draw.line([(x, top), (x, bottom)], fill=(31, 119, 180))
 
-        resized_io = BytesIO()
-        image.save(resized_io, format="PNG")
-        resized_io.seek(0)
-        return resized_io.read()
-    except Exception as e:
-        raise Exception(f"Failed to generate audio waveform: {str(e)}")
+    waveform_io = BytesIO()
+    image.save(waveform_io, format="PNG")
+    return waveform_io.getvalue()
 
 
 def generate_pdf_preview(file_obj: IOBase) -> bytes:
-    from PIL import Image
-
     try:
         import pypdfium2 as pdfium
     except ImportError:
         return generate_no_preview_available()
+    max_size = (300, 300)
     file_obj.seek(0)
     pdf = pdfium.PdfDocument(file_obj)
-    page = pdf[0]
-    pil_image = page.render(scale=2).to_pil()
-    preview_io = BytesIO()
-    pil_image.save(preview_io, format="JPEG")
-    preview_io.seek(0)
-    image = Image.open(preview_io)
-    image = resize_image(image, max_size=(300, 300))
+    try:
+        page = pdf[0]
+        try:
+            # render at about twice the preview size (not a fixed scale), leaving the final downsample to LANCZOS
+            scale = min(2, 2 * max(max_size) / max(page.get_size()))
+            image = resize_image(page.render(scale=scale).to_pil(), max_size=max_size)
+        finally:
+            page.close()
+    finally:
+        pdf.close()  # free pdfium's native allocations now, rather than whenever the objects are collected
 
     resized_io = BytesIO()
-    image.save(resized_io, format="PNG")
-    resized_io.seek(0)
-    return resized_io.read()
+    # lossless, so rendered text stays crisp; still about half the size of the equivalent PNG
+    image.save(resized_io, format="WEBP", lossless=True)
+    return resized_io.getvalue()
 
 
 def generate_video_thumbnail(file_obj: IOBase) -> bytes:
-    from PIL import Image
+    return generate_video_thumbnails(file_obj, [1.0])[0]
 
+
+def generate_video_thumbnails(file_obj: IOBase, timestamps: list[float], size=(200, 200)) -> list[bytes]:
+    """Extract a JPEG thumbnail at each of `timestamps` (seconds), in one ffmpeg pass over the video.
+
+    Thumbnails are returned in ascending timestamp order; timestamps past the end of the video yield no thumbnail.
+    """
+    timestamps = sorted(set(timestamps))
+    if not timestamps:
+        return []
     file_obj.seek(0)
+    try:
+        # most containers can be streamed straight into stdin, which skips writing the video to disk (and never
+        # holds all of it in memory)
+        return _extract_video_frames("pipe:0", timestamps, size, file_obj)
+    except Exception:
+        pass
+
+    # others (e.g. mp4 files without faststart) need random access to the input, so go through a temp file
     temp_file = tempfile.NamedTemporaryFile(delete=False)
-    frame_file = None
     try:
-        temp_file.write(file_obj.read())
+        file_obj.seek(0)
+        shutil.copyfileobj(file_obj, temp_file, STREAM_CHUNK_SIZE)
         temp_file.flush()
         temp_file.close()
 
         if not os.path.exists(temp_file.name):
             raise Exception(f"Temporary file {temp_file.name} was not created successfully.")
-
-        frame_file = tempfile.NamedTemporaryFile(delete=False, suffix=".jpg")
-        frame_file.close()
-
-        result = subprocess.run(
-            ["ffmpeg", "-y", "-i", temp_file.name, "-ss", "00:00:01.000", "-vframes", "1", frame_file.name],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-
-        if result.returncode != 0:
-            error_message = result.stderr.decode("utf-8")
-            raise Exception(f"Failed to generate video thumbnail: {error_message}")
-
-        with open(frame_file.name, "rb") as img_file:
-            image = Image.open(img_file)
-            image = resize_image(image, max_size=(200, 200))
-            thumbnail_io = BytesIO()
-            image.save(thumbnail_io, format="JPEG")
-            thumbnail_io.seek(0)
-            return thumbnail_io.read()
+        return _extract_video_frames(temp_file.name, timestamps, size)
     finally:
         os.remove(temp_file.name)
-        if frame_file:
-            os.remove(frame_file.name)
 
 
+def _extract_video_frames(
+    input_path: str, timestamps: list[float], size=(200, 200), input_file: Optional[IO[bytes]] = None
+) -> list[bytes]:
+    # seek to the first timestamp before opening the input (fast seek; frame times then restart from 0), pick the
+    # first frame at or after each timestamp with a select filter, scale within ffmpeg, and read the JPEG frames
+    # back-to-back from stdout
+    start = timestamps[0]
+    select = "+".join(
+        f"gte(t,{ts - start:.3f})*(isnan(prev_pts)+lt(prev_pts*TB,{ts - start:.3f}))" for ts in timestamps
+    )
+    process = subprocess.Popen(
+        [
+            "ffmpeg",
+            "-v",
+            "error",
+            "-y",
+            "-ss",
+            f"{start:.3f}",
+            "-i",
+            input_path,
+            "-vf",
+            f"select='{select}',scale={size[0]}:{size[1]}:force_original_aspect_ratio=decrease",
+            "-vsync",
+            "vfr",
+            "-frames:v",
+            str(len(timestamps)),
+            "-f",
+            "image2pipe",
+            "-vcodec",
+            "mjpeg",
+            "pipe:1",
+        ],
+        stdin=subprocess.PIPE if input_file is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    # feed stdin and drain stderr from worker threads while stdout is read here, so no pipe fills up and blocks
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        if input_file is not None:
+            executor.submit(_feed_stdin, input_file, process.stdin)
+        stderr = executor.submit(process.stderr.read)
+        stdout = process.stdout.read()
+    process.wait()
+
+    if process.returncode != 0:
+        error_message = stderr.result().decode("utf-8")
+        raise Exception(f"Failed to generate video thumbnail: {error_message}")
+    frames = _split_jpeg_stream(stdout)
+    if not frames:
+        raise Exception("Failed to generate video thumbnail: no frame at the thumbnail timestamp")
+    return frames
+
+
+def _feed_stdin(input_file: IO[bytes], stdin: IO[bytes]) -> None:
+    try:
+        shutil.copyfileobj(input_file, stdin, STREAM_CHUNK_SIZE)
+    except (BrokenPipeError, OSError):
+        pass  # ffmpeg stops reading (and exits) once it has its frames, or on an input it can't stream
+    finally:
+        try:
+            stdin.close()
+        except OSError:
+            pass
+
+
+def _split_jpeg_stream(data: bytes) -> list[bytes]:
+    # walk the JPEG marker segments of each back-to-back frame rather than searching for the EOI bytes, which can
+    # legitimately occur inside a segment's payload
+    frames = []
+    pos = 0
+    while data.startswith(b"\xff\xd8", pos):
+        i = pos + 2
+        while i + 1 < len(data) and data[i] == 0xFF:
+            marker = data[i + 1]
+            if marker == 0xD9:  # EOI
+                frames.append(data[pos : i + 2])
+                break
+            if marker == 0xFF:  # fill byte
+                i += 1
+                continue
+            i += 2 + int.from_bytes(data[i + 2 : i + 4], "big")
+            if marker == 0xDA:  # SOS; skip the entropy-coded data, where FF00 is a stuffed byte and FFD0-FFD7 restarts
+                i = data.find(b"\xff", i)
+                while i != -1 and i + 1 < len(data) and (data[i + 1] == 0x00 or 0xD0 <= data[i + 1] <= 0xD7):
+                    i = data.find(b"\xff", i + 2)
+                if i == -1:
+                    return frames
+        else:
+            return frames  # truncated or malformed frame
+        pos = i + 2
+    return frames
+
+
+# the image never changes, and is served on every failed preview generation / retrieval
+@lru_cache(maxsize=1)
 def generate_no_preview_available() -> bytes:
     return generate_text_image("No Preview Available")
 
@@ -636,5 +1154,13 @@ def generate_text_image(text: str, width=200, height=200, font_size=10) -> bytes
 
     thumb_io = BytesIO()
     image.save(thumb_io, format="JPEG")
-    thumb_io.seek(0)
-    return thumb_io.read()
+    return thumb_io.getvalue()
+
+
+# the media types that get a real preview; every other type gets the "no preview available" image
+_PREVIEW_GENERATORS = {
+    MediaType.image: generate_image_thumbnail,
+    MediaType.audio: generate_audio_waveform,
+    MediaType.video: generate_video_thumbnail,
+    MediaType.pdf: generate_pdf_preview,
+}
@@ -1,16 +1,22 @@
+import os
 import re
 from datetime import datetime, timezone
-from random import choices
+from functools import lru_cache
 from string import ascii_lowercase
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 
 if TYPE_CHECKING:
     from pandas import DataFrame
     from pydantic import ValidationError
 
 
+CAMEL_BOUNDARY_RE = re.compile(r"(?<!^)(?=[A-Z])")
+
+
+# pure, and called over and over with the same small set of class / field names
+@lru_cache(maxsize=1024)
 def camel_to_snake(camel_case):
-    snake_case = re.sub(r"(?<!^)(?=[A-Z])", "_", camel_case).lower()
+    snake_case = CAMEL_BOUNDARY_RE.sub("_", camel_case).lower()
     return snake_case
 
 
@@ -18,37 +24,139 @@ def now_with_dt():
     return datetime.now(tz=timezone.utc)
 
 
+# maps each random byte below 234 to a lowercase letter, 9 byte values per letter; bytes 234+ are dropped and redrawn,
+# as mapping all 256 would make some letters more likely than others
+_ID_SUFFIX_TABLE = (ascii_lowercase * 9).encode().ljust(256, b"-")
+_ID_SUFFIX_REJECTED = bytes(range(len(ascii_lowercase) * 9, 256))
+
+
 def date_id(now=None):
     now = now or now_with_dt()
-    return now.strftime("%Y%m%d%H%M%S") + "".join(choices(ascii_lowercase, k=6))
+    # still six lowercase letters like existing ids; 8 bytes are almost always enough to keep 6 of them
+    suffix = b""
+    while len(suffix) < 6:
+        suffix += os.urandom(8).translate(_ID_SUFFIX_TABLE, _ID_SUFFIX_REJECTED)
+    return now.strftime("%Y%m%d%H%M%S") + suffix[:6].decode()
 
 
-def load_data_from_file(file, replace_nan=True) -> "DataFrame":
-    import numpy as np
+def _read_excel(file) -> "DataFrame":
+    import pandas as pd
+
+    return pd.read_excel(file, dtype=str)
+
+
+def _read_json(file) -> "DataFrame":
+    import pandas as pd
+
+    return pd.read_json(file, dtype=str)
+
+
+def _read_parquet(file) -> "DataFrame":
     import pandas as pd
 
-    if file.type == "text/csv":
-        data = pd.read_csv(file, dtype=str, low_memory=False)
-    elif file.type == "text/tab-separated-values":
-        data = pd.read_csv(file, dtype=str, low_memory=False, sep="\t")
-    elif (
-        file.type == "application/vnd.ms-excel"
-        or file.type == "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    ):
-        data = pd.read_excel(file, dtype=str)
-    elif file.type == "application/json":
-        data = pd.read_json(file, dtype=str)
-    elif file.type == "application/octet-stream":  # Assuming this is a Parquet file for now
-        data = pd.read_parquet(file, dtype=str)
+    # read_parquet has no dtype option; stringify the values, leaving missing ones missing
+    data = pd.read_parquet(file)
+    return data.astype(str).where(data.notna())
+
+
+# delimited text is read by `_read_delimited_with_pyarrow` when possible, so it is dispatched on separately
+_DELIMITERS = {"text/csv": ",", "text/tab-separated-values": "\t"}
+_FILE_READERS = {
+    "application/vnd.ms-excel": _read_excel,
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": _read_excel,
+    "application/json": _read_json,
+    "application/octet-stream": _read_parquet,  # Assuming this is a Parquet file for now
+}
+
+
+def load_data_from_file(file, replace_nan=True) -> "DataFrame":
+    if (sep := _DELIMITERS.get(file.type)) is not None:
+        data = _read_delimited_with_pyarrow(file, sep, replace_nan)
+        if data is not None:
+            return data
+        import pandas as pd
+
+        file.seek(0)
+        data = pd.read_csv(file, dtype=str, low_memory=False, sep=sep)
+    elif (reader := _FILE_READERS.get(file.type)) is not None:
+        data = reader(file)
     else:
         raise RuntimeError(f"Unknown / unsupported file type {file.type}")
 
     if replace_nan:
-        return data.replace({np.nan: None})
+        return data.astype(object).where(data.notna(), None)
     else:
         return data
 
 
+# the strings `pd.read_csv` reads as missing by default (`na_values`); kept here as the pandas list is not public
+_PANDAS_NA_VALUES = frozenset(
+    [
+        "",
+        "#N/A",
+        "#N/A N/A",
+        "#NA",
+        "-1.#IND",
+        "-1.#QNAN",
+        "-NaN",
+        "-nan",
+        "1.#IND",
+        "1.#QNAN",
+        "<NA>",
+        "N/A",
+        "NA",
+        "NULL",
+        "NaN",
+        "None",
+        "n/a",
+        "nan",
+        "null",
+    ]
+)
+
+
+def _read_delimited_with_pyarrow(file, sep: str, replace_nan: bool) -> Optional["DataFrame"]:
+    """Read a CSV / TSV with pyarrow's (multi-threaded) parser, every column as strings.
+
+    Returns None when pyarrow is not installed, or for input the pandas parser treats differently (duplicate column
+    names, ragged rows), so the caller can fall back to `pd.read_csv`.
+    """
+    try:
+        import pyarrow as pa
+        from pyarrow import csv
+    except ImportError:
+        return None
+    import pandas as pd
+
+    parse_options = csv.ParseOptions(delimiter=sep)
+    try:
+        file.seek(0)
+        # the column names come from the first block only; they are needed to read every column as a string
+        names = csv.open_csv(file, parse_options=parse_options).schema.names
+        if len(set(names)) != len(names):
+            return None
+        file.seek(0)
+        table = csv.read_csv(
+            file,
+            parse_options=parse_options,
+            convert_options=csv.ConvertOptions(
+                column_types={name: pa.string() for name in names},
+                # pyarrow's default null markers differ from pandas'; use pandas' so the same cells come back missing
+                null_values=sorted(_PANDAS_NA_VALUES),
+                strings_can_be_null=True,
+            ),
+        )
+    except pa.ArrowInvalid:
+        return None
+
+    if not replace_nan:
+        return table.to_pandas()
+    # straight to object columns holding None for missing values, without a separate pass to replace NaN
+    return pd.DataFrame(
+        {name: column.to_numpy(zero_copy_only=False) for name, column in zip(names, table.columns)}, dtype=object
+    )
+
+
 def format_validation_error(error: "ValidationError") -> str:
     """Parse Pydantic ValidationError and return a formatted markdown error message."""
 
@@ -0,0 +1,413 @@
+import asyncio
+import json
+import random
+import threading
+import time
+
+import pytest
+from logzero import logger
+from pydantic import BaseModel
+
+from supersullytools.llm.agent import AgentStates, AgentTool, ChatAgent, ToolUseModes
+from supersullytools.llm.completions import CompletionResponse, PromptMessage, get_default_models
+from supersullytools.utils.misc import now_with_dt
+
+SUMMARY_MARKER = "Update the running summary"
+
+
+class StubCompletionHandler:
+    """Returns scripted responses (summaries get a fixed reply) and records every prompt it is sent."""
+
+    def __init__(self, responses: list[str] = ()):
+        self.model = get_default_models("OpenAI")[0]
+        self.responses = list(responses)
+        self.prompts: list[list[PromptMessage]] = []
+
+    def get_model_by_name_or_id(self, model_name_or_id):
+        return self.model
+
+    def get_completion(self, model, prompt, max_response_tokens=None, **kwargs) -> CompletionResponse:
+        self.prompts.append(list(prompt))
+        if SUMMARY_MARKER in prompt[0].content:
+            content = f"summary #{len(self.summary_prompts) - 1}"
+        else:
+            content = self.responses.pop(0)
+        return CompletionResponse(
+            content=content,
+            input_tokens=1,
+            output_tokens=1,
+            llm_metadata=model,
+            generated_at=now_with_dt(),
+            stop_reason="stop",
+            completion_time_ms=1,
+        )
+
+    @property
+    def summary_prompts(self) -> list[list[PromptMessage]]:
+        return [x for x in self.prompts if SUMMARY_MARKER in x[0].content]
+
+    @property
+    def chat_prompts(self) -> list[list[PromptMessage]]:
+        return [x for x in self.prompts if SUMMARY_MARKER not in x[0].content]
+
+
+class EchoParams(BaseModel):
+    value: str = "init"
+
+
+def _echo_tool(name: str = "Echo") -> AgentTool:
+    return AgentTool(name=name, params_model=EchoParams, mechanism=lambda p: f"echo:{p.value}", safe_tool=True)
+
+
+def _make_agent(handler: StubCompletionHandler, tools: list[AgentTool] = None, **kwargs) -> ChatAgent:
+    return ChatAgent(
+        agent_description="You are a test agent.",
+        logger=logger,
+        completion_handler=handler,
+        tool_profiles={"all": tools if tools is not None else [_echo_tool()]},
+        tool_use_mode=ToolUseModes.automatic_safe_only,
+        **kwargs,
+    )
+
+
+def _run_until_idle(agent: ChatAgent):
+    agent.run_agent()
+    while agent.working:
+        agent.run_agent()
+
+
+def _tool_call(name: str = "Echo", value: str = "x", closed: bool = True) -> str:
+    call = json.dumps({"name": name, "reason": "testing", "parameters": {"value": value}})
+    return f"<tool>{call}</tool>" if closed else f"<tool>{call}"
+
+
+# the parsing / filtering the agent did before it was optimized; the current implementation must agree with these
+
+
+def _baseline_extract_tool_calls(msg: str) -> list[dict]:
+    ai_msg, fn_call_str = msg.split("<tool>", maxsplit=1)
+    tool_call_strs = [this_call_str.split("</tool>", maxsplit=1)[0] for this_call_str in fn_call_str.split("<tool>")]
+    return [json.loads(x) for x in tool_call_strs]
+
+
+def _outcome(extract, msg: str):
+    # the parsed calls, or the type of error raised; text after an unclosed call makes both implementations fail
+    try:
+        return extract(msg)
+    except Exception as e:
+        return type(e)
+
+
+def _baseline_chat_history(messages, include_system_messages: bool, include_function_calls: bool):
+    messages = [x.model_copy() for x in messages]
+
+    def ai_system_msg(x: PromptMessage):
+        return x.role == "assistant" and x.content in ["CONTINUE", "PASS"]
+
+    if not include_system_messages:
+        if include_function_calls:
+            messages = [
+                x for x in messages if (not x.role == "system" and not ai_system_msg(x)) or "<tool_result>" in x.content
+            ]
+        else:
+            messages = [x for x in messages if not x.role == "system" and not ai_system_msg(x)]
+    if not include_function_calls:
+        for msg in messages:
+            msg.content = msg.content.split("<tool>", maxsplit=1)[0]
+    return messages
+
+
+class TestExtractToolCalls:
+    @pytest.mark.parametrize(
+        "msg, expected_values",
+        [
+            ("Sure." + _tool_call(value="a"), ["a"]),
+            ("Two calls" + _tool_call(value="a") + "\n" + _tool_call(value="b"), ["a", "b"]),
+            # the closing tag is missing from the last call
+            ("Unclosed" + _tool_call(value="a") + _tool_call(value="b", closed=False), ["a", "b"]),
+            # back-to-back calls, the first never closed
+            (_tool_call(value="a", closed=False) + _tool_call(value="b"), ["a", "b"]),
+            (_tool_call(value="a", closed=False) + _tool_call(value="b", closed=False), ["a", "b"]),
+            # text after a closed call is not part of it
+            (_tool_call(value="a") + " and then some text", ["a"]),
+            ("ml\n" + _tool_call(value="line\nbreak") + "\n", ["line\nbreak"]),
+        ],
+    )
+    def test_fixed_cases(self, msg, expected_values):
+        agent = _make_agent(StubCompletionHandler())
+
+        tool_calls = agent.extract_tool_calls_from_msg(msg)
+
+        assert [x["parameters"]["value"] for x in tool_calls] == expected_values
+        assert tool_calls == _baseline_extract_tool_calls(msg)
+
+    def test_no_tool_calls(self):
+        agent = _make_agent(StubCompletionHandler())
+
+        with pytest.raises(ValueError):
+            agent.extract_tool_calls_from_msg("just a message")
+
+    def test_invalid_json(self):
+        agent = _make_agent(StubCompletionHandler())
+
+        with pytest.raises(json.JSONDecodeError):
+            agent.extract_tool_calls_from_msg("<tool>{not json}</tool>")
+
+    def test_matches_baseline_on_random_messages(self):
+        agent = _make_agent(StubCompletionHandler())
+        rng = random.Random(1234)
+        texts = ["", "Sure.", "\n", " ok ", "a </tool> b"]
+        for _ in range(500):
+            msg = rng.choice(texts)
+            for idx in range(rng.randint(1, 4)):
+                msg += _tool_call(value=f"v{idx}", closed=rng.random() < 0.7)
+                if rng.random() < 0.3:
+                    msg += rng.choice(texts)
+            assert _outcome(agent.extract_tool_calls_from_msg, msg) == _outcome(_baseline_extract_tool_calls, msg), msg
+
+
+class TestChatHistory:
+    def test_matches_baseline_on_random_histories(self):
+        rng = random.Random(4321)
+        contents = [
+            "hello",
+            "PASS",
+            "CONTINUE",
+            "thinking" + _tool_call(),
+            "Tool use complete\n<tool_used>Echo</tool_used>\n<tool_result>\necho:x\n</tool_result>\n",
+            "<system>note</system>",
+        ]
+        for _ in range(200):
+            agent = _make_agent(StubCompletionHandler())
+            for _ in range(rng.randint(0, 12)):
+                agent.force_add_chat_msg(rng.choice(contents), rng.choice(["system", "user", "assistant"]))
+            for include_system_messages in (False, True):
+                for include_function_calls in (False, True):
+                    actual = agent.get_chat_history(include_system_messages, include_function_calls)
+                    expected = _baseline_chat_history(
+                        agent.chat_history, include_system_messages, include_function_calls
+                    )
+                    assert actual == expected
+
+    def test_returns_copies(self):
+        agent = _make_agent(StubCompletionHandler())
+        agent.force_add_chat_msg("hello" + _tool_call(), "assistant")
+
+        agent.get_chat_history(include_function_calls=True)[0].content = "changed"
+
+        assert agent.chat_history[0].content.startswith("hello<tool>")
+
+    def test_init_tool_messages_hidden(self):
+        agent = _make_agent(StubCompletionHandler(), init_tools_to_use=["Echo"])
+
+        assert agent.chat_history  # the init tool call and its result
+        assert agent.get_chat_history(include_system_messages=True, include_function_calls=True) == []
+
+
+class TestToolMarkers:
+    def test_edited_message_is_rescanned(self):
+        agent = _make_agent(StubCompletionHandler())
+        agent.force_add_chat_msg("no tools yet", "assistant")
+        msg = agent.chat_history[-1]
+        assert agent._tool_markers(msg) == (False, False)
+
+        msg.content = "now with a tool" + _tool_call()
+        assert agent._tool_markers(msg) == (True, False)
+        assert agent.get_pending_tool_calls_data()[0]["name"] == "Echo"
+
+        msg.content = "<tool_result>\nx\n</tool_result>"
+        assert agent._tool_markers(msg) == (False, True)
+        assert agent.get_pending_tool_calls_data() == []
+
+    def test_replaced_message(self):
+        agent = _make_agent(StubCompletionHandler())
+        agent.force_add_chat_msg("no tools", "assistant")
+        assert agent.get_pending_tool_calls_data() == []
+
+        agent.chat_history[-1] = PromptMessage(role="assistant", content=_tool_call(value="replaced"))
+        assert agent.get_pending_tool_calls_data()[0]["parameters"]["value"] == "replaced"
+
+
+class TestVerifiedToolCalls:
+    def test_uses_calls_parsed_during_verification(self):
+        handler = StubCompletionHandler([_tool_call(value="a"), "done"])
+        agent = _make_agent(handler)
+        agent.message_from_user("hi")
+
+        agent.run_agent()
+
+        assert agent.current_state == AgentStates.pending_tool_use
+        assert agent._verified_tool_calls[0] is agent.chat_history[-1].content
+        assert agent.get_pending_tool_calls_data() is agent._verified_tool_calls[1]
+
+        _run_until_idle(agent)
+        assert agent.applied_tool_call_results == ["echo:a"]
+        assert agent.chat_history[-1].content == "done"
+
+    def test_edited_message_is_reparsed(self):
+        handler = StubCompletionHandler([_tool_call(value="a"), "done"])
+        agent = _make_agent(handler)
+        agent.message_from_user("hi")
+        agent.run_agent()
+
+        agent.chat_history[-1].content = _tool_call(value="edited")
+
+        assert agent.get_pending_tool_calls_data()[0]["parameters"]["value"] == "edited"
+        _run_until_idle(agent)
+        assert agent.applied_tool_call_results == ["echo:edited"]
+
+    def test_invalid_response_is_retried(self):
+        handler = StubCompletionHandler([_tool_call(name="Missing"), "fine"])
+        agent = _make_agent(handler)
+        agent.message_from_user("hi")
+
+        _run_until_idle(agent)
+
+        assert len(handler.chat_prompts) == 2
+        assert "Invalid tool specified Missing" in handler.chat_prompts[1][-1].content
+        assert agent.chat_history[-1].content == "fine"
+
+
+class TestHistoryCompaction:
+    @staticmethod
+    def _chat(agent: ChatAgent, turns: int):
+        for idx in range(turns):
+            agent.message_from_user(f"user {idx}")
+            _run_until_idle(agent)
+
+    def test_disabled_by_default(self):
+        handler = StubCompletionHandler([f"reply {x}" for x in range(10)])
+        agent = _make_agent(handler)
+
+        self._chat(agent, 10)
+
+        assert handler.summary_prompts == []
+        # prefix (2) + every earlier message + the final message
+        assert len(handler.chat_prompts[-1]) == 2 + 19
+
+    def test_compaction_window(self):
+        handler = StubCompletionHandler([f"reply {x}" for x in range(10)])
+        agent = _make_agent(handler, max_history_msgs=4, init_tools_to_use=["Echo"])
+        init_msgs = agent.chat_history[: agent._chat_start_idx]
+        assert len(init_msgs) == 4
+
+        # 3 turns (5 messages once the 3rd user message arrives) is over the limit of 4
+        self._chat(agent, 2)
+        assert handler.summary_prompts == []
+        agent.message_from_user("user 2")
+        _run_until_idle(agent)
+
+        assert len(handler.summary_prompts) == 1
+        transcript = handler.summary_prompts[0][0].content
+        assert "user: user 0" in transcript and "assistant: reply 1" in transcript
+        assert "user 2" not in transcript
+        # init tool output is never folded into the summary
+        assert "echo:init" not in transcript and "PASS" not in transcript
+
+        prompt = handler.chat_prompts[-1]
+        # the static prefix, the init messages unchanged, then the summary exchange
+        assert prompt[2:6] == init_msgs
+        assert prompt[6].role == "user" and "summary #0" in prompt[6].content
+        assert prompt[7] == PromptMessage(role="assistant", content="CONTINUE")
+        # the window skipped the leading assistant msg, so only the final user msg follows the summary
+        assert len(prompt) == 9
+        assert prompt[8].role == "user" and "user 2" in prompt[8].content
+
+        # the full history is kept
+        assert len(agent.chat_history) == len(init_msgs) + 6
+
+    def test_summary_is_updated_incrementally(self):
+        handler = StubCompletionHandler([f"reply {x}" for x in range(10)])
+        agent = _make_agent(handler, max_history_msgs=4)
+
+        self._chat(agent, 6)
+
+        assert len(handler.summary_prompts) == 2
+        # the second summary builds on the first, and only covers messages the first didn't
+        second = handler.summary_prompts[1][0].content
+        assert "summary #0" in second
+        assert "user 0" not in second
+        for prompt in handler.chat_prompts:
+            non_prefix = prompt[2:]
+            # never more than summary exchange + the limit of messages + the final msg
+            assert len(non_prefix) <= 2 + 4 + 1
+            if any("summary #" in x.content for x in non_prefix):
+                assert non_prefix[1].content == "CONTINUE"
+                assert non_prefix[2].role != "assistant"
+
+
+class ConcurrencyProbe:
+    """Tool mechanism that records how many calls overlap; values starting with "fail" raise."""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.threads = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, params: EchoParams) -> str:
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            self.threads.add(threading.get_ident())
+        try:
+            # later calls finish first, so results collected in completion order would come back reversed
+            time.sleep(self.delay / (1 + int(params.value.rsplit("-", 1)[-1])))
+            if params.value.startswith("fail"):
+                raise RuntimeError(f"tool {params.value} broke")
+            return f"echo:{params.value}"
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+class TestParallelToolCalls:
+    VALUES = ["a-0", "b-1", "fail-2", "d-3", "e-4"]
+
+    def _agent(self, probe: ConcurrencyProbe, max_parallel_tool_calls: int) -> tuple[ChatAgent, StubCompletionHandler]:
+        handler = StubCompletionHandler(["".join(_tool_call(name="Probe", value=x) for x in self.VALUES), "done"])
+        tool = AgentTool(name="Probe", params_model=EchoParams, mechanism=probe, safe_tool=True)
+        agent = _make_agent(handler, tools=[tool], max_parallel_tool_calls=max_parallel_tool_calls)
+        agent.message_from_user("use the tools")
+        return agent, handler
+
+    def _check_results(self, agent: ChatAgent, handler: StubCompletionHandler):
+        assert [x.params["value"] for x in agent.applied_tool_calls] == self.VALUES
+        assert agent.applied_tool_call_results[:2] == ["echo:a-0", "echo:b-1"]
+        assert agent.applied_tool_call_results[2] == "TOOL FAILED!\ntool fail-2 broke"
+        assert agent.applied_tool_call_results[3:] == ["echo:d-3", "echo:e-4"]
+        # the results reach the agent in call order, in a single system message
+        results_msg = handler.chat_prompts[-1][-1].content
+        positions = [results_msg.index(x) for x in agent.applied_tool_call_results]
+        assert positions == sorted(positions)
+        assert agent.chat_history[-1].content == "done"
+        assert agent.current_state == AgentStates.ready_for_message
+
+    @pytest.mark.parametrize("max_parallel_tool_calls", [1, 2, 8])
+    def test_run_agent(self, max_parallel_tool_calls):
+        probe = ConcurrencyProbe()
+        agent, handler = self._agent(probe, max_parallel_tool_calls)
+
+        _run_until_idle(agent)
+
+        self._check_results(agent, handler)
+        assert probe.max_active == min(max_parallel_tool_calls, len(self.VALUES))
+        if max_parallel_tool_calls == 1:
+            assert probe.threads == {threading.get_ident()}
+
+    @pytest.mark.parametrize("max_parallel_tool_calls", [1, 2, 8])
+    def test_arun_agent(self, max_parallel_tool_calls):
+        probe = ConcurrencyProbe()
+        agent, handler = self._agent(probe, max_parallel_tool_calls)
+
+        async def _run():
+            await agent.arun_agent()
+            while agent.working:
+                await agent.arun_agent()
+
+        asyncio.run(_run())
+
+        self._check_results(agent, handler)
+        assert probe.max_active == min(max_parallel_tool_calls, len(self.VALUES))
+        assert threading.get_ident() not in probe.threads
@@ -0,0 +1,206 @@
+from types import SimpleNamespace
+
+from logzero import logger
+from openai.types import CompletionUsage
+from openai.types.chat import ChatCompletionChunk
+
+from supersullytools.llm.completions import (
+    CompletionHandler,
+    CompletionResponse,
+    LLMResponseCache,
+    PromptMessage,
+    SemanticCache,
+    get_default_models,
+)
+from supersullytools.utils.misc import now_with_dt
+
+
+class StubEmbeddings:
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, model, input):
+        self.calls += 1
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[1.0, 0.0, 0.0])])
+
+
+def _make_handler():
+    client = SimpleNamespace(embeddings=StubEmbeddings())
+    handler = CompletionHandler(
+        logger=logger,
+        openai_client=client,
+        enable_bedrock=False,
+        response_cache=LLMResponseCache(),
+        semantic_cache=SemanticCache(),
+    )
+    return handler, client.embeddings
+
+
+def _make_response(model) -> CompletionResponse:
+    return CompletionResponse(
+        content="cached answer",
+        input_tokens=1,
+        output_tokens=1,
+        llm_metadata=model,
+        generated_at=now_with_dt(),
+        stop_reason="stop",
+        completion_time_ms=1,
+    )
+
+
+class TestCompletionCaches:
+    def test_exact_hit_does_not_embed(self):
+        handler, embeddings = _make_handler()
+        model = get_default_models("OpenAI")[0]
+        prompt = "What is the capital of France?"
+        cache_key = handler.response_cache.make_key(
+            model, [PromptMessage(content=prompt, role="user")], handler.default_max_response_tokens
+        )
+        handler.response_cache.set(cache_key, _make_response(model))
+
+        response = handler.get_completion(model, prompt)
+
+        assert response.content == "cached answer"
+        assert embeddings.calls == 0
+
+    def test_semantic_hit_after_exact_miss(self):
+        handler, embeddings = _make_handler()
+        model = get_default_models("OpenAI")[0]
+        vector = handler.semantic_cache.embed(handler.openai_client, "earlier prompt")
+        handler.semantic_cache.add(model, handler.default_max_response_tokens, vector, _make_response(model))
+        embeddings.calls = 0
+
+        response = handler.get_completion(model, "a differently worded prompt")
+
+        assert response.content == "cached answer"
+        assert embeddings.calls == 1
+
+
+class StubChatCompletions:
+    def __init__(self, chunks: list[ChatCompletionChunk]):
+        self.chunks = chunks
+
+    def create(self, **kwargs):
+        assert kwargs["stream"]
+        return iter(self.chunks)
+
+
+def _chunk(content=None, finish_reason=None, usage=None, choices=True) -> ChatCompletionChunk:
+    return ChatCompletionChunk(
+        id="chunk",
+        created=0,
+        model="gpt-4o",
+        object="chat.completion.chunk",
+        choices=[{"index": 0, "delta": {"content": content}, "finish_reason": finish_reason}] if choices else [],
+        usage=usage,
+    )
+
+
+def _stream(chunks: list[ChatCompletionChunk]) -> list:
+    client = SimpleNamespace(chat=SimpleNamespace(completions=StubChatCompletions(chunks)))
+    handler = CompletionHandler(logger=logger, openai_client=client, enable_bedrock=False)
+    return list(handler.get_completion_stream(get_default_models("OpenAI")[0], "Hello"))
+
+
+class TestOpenAiStream:
+    def test_with_usage_chunk(self):
+        usage = CompletionUsage(
+            prompt_tokens=10,
+            completion_tokens=2,
+            total_tokens=12,
+            prompt_tokens_details={"cached_tokens": 4},
+            completion_tokens_details={"reasoning_tokens": 1},
+        )
+        chunks = [_chunk("Hi"), _chunk(" there", finish_reason="stop"), _chunk(choices=False, usage=usage)]
+
+        *texts, response = _stream(chunks)
+
+        assert texts == ["Hi", " there"]
+        assert response.content == "Hi there"
+        assert response.stop_reason == "stop"
+        assert (response.input_tokens, response.cached_input_tokens, response.output_tokens) == (10, 4, 2)
+        assert response.reasoning_tokens == 1
+
+    def test_without_usage_chunk(self):
+        # e.g. a stream cut short, or an OpenAI-compatible endpoint that ignores `stream_options`
+        *texts, response = _stream([_chunk("Hi"), _chunk(" there")])
+
+        assert texts == ["Hi", " there"]
+        assert response.content == "Hi there"
+        assert (response.input_tokens, response.cached_input_tokens, response.output_tokens) == (0, 0, 0)
+        assert response.reasoning_tokens == 0
+
+    def test_usage_without_token_details(self):
+        usage = CompletionUsage(prompt_tokens=10, completion_tokens=2, total_tokens=12)
+
+        *_, response = _stream([_chunk("Hi", finish_reason="stop"), _chunk(choices=False, usage=usage)])
+
+        assert (response.input_tokens, response.cached_input_tokens, response.output_tokens) == (10, 0, 2)
+        assert response.reasoning_tokens == 0
+
+
+class TestBedrockMessages:
+    @staticmethod
+    def _handler() -> CompletionHandler:
+        return CompletionHandler(logger=logger, enable_openai=False, bedrock_runtime_client=object())
+
+    @staticmethod
+    def _model(supports_prompt_caching: bool):
+        model = next(x for x in get_default_models("AWS Bedrock") if x.supports_prompt_caching)
+        return model.model_copy(update={"supports_prompt_caching": supports_prompt_caching})
+
+    def test_system_prompt_cache_point(self):
+        prompt = [
+            PromptMessage(role="system", content="be terse"),
+            PromptMessage(role="user", content="hi"),
+            PromptMessage(role="system", content="a tool result"),
+            PromptMessage(role="user", content="and now?"),
+        ]
+
+        system, messages = self._handler()._build_bedrock_messages(self._model(True), prompt)
+
+        assert system == [{"text": "be terse"}, {"cachePoint": {"type": "default"}}]
+        # later system messages stay in place, as user turns
+        assert messages == [
+            {"role": "user", "content": [{"text": "hi"}]},
+            {"role": "user", "content": [{"text": "a tool result"}]},
+            {"role": "user", "content": [{"text": "and now?"}]},
+        ]
+
+    def test_agent_prefix_cache_point(self):
+        from supersullytools.llm.agent import ChatAgent
+
+        handler = self._handler()
+        agent = ChatAgent(
+            agent_description="You are a test agent.",
+            logger=logger,
+            completion_handler=handler,
+            default_completion_model=self._model(True),
+        )
+        prompt = agent._get_chat_prefix() + [PromptMessage(role="user", content="hello")]
+
+        system, messages = handler._build_bedrock_messages(self._model(True), prompt)
+
+        assert system == []
+        # the static user / assistant exchange ends with a cache point; the chat after it is not cached
+        assert [x["role"] for x in messages] == ["user", "assistant", "user"]
+        assert messages[0]["content"] == [{"text": prompt[0].content}]
+        assert messages[1]["content"] == [{"text": prompt[1].content}, {"cachePoint": {"type": "default"}}]
+        assert messages[2]["content"] == [{"text": "hello"}]
+
+    def test_no_cache_points_without_support(self):
+        prompt = [
+            PromptMessage(role="system", content="be terse"),
+            PromptMessage(role="assistant", content="static", cache_point=True),
+            PromptMessage(role="user", content="hi"),
+        ]
+
+        system, messages = self._handler()._build_bedrock_messages(self._model(False), prompt)
+
+        assert system == [{"text": "be terse"}]
+        assert all("cachePoint" not in block for x in messages for block in x["content"])
+
+    def test_cache_point_is_not_serialized(self):
+        msg = PromptMessage(role="assistant", content="static", cache_point=True)
+
+        assert msg.model_dump() == {"role": "assistant", "content": "static"}
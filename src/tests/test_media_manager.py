@@ -0,0 +1,251 @@
+import gzip
+import logging
+import os
+import secrets
+from io import BytesIO
+
+import pytest
+
+from supersullytools.utils import media_manager
+from supersullytools.utils.media_manager import (
+    CRYPTOGRAPHY_AVAILABLE,
+    MediaManager,
+    StoredMedia,
+    _AesGcmStage,
+    _gunzip,
+    _GzipStage,
+    _iter_gunzip,
+    _TransformingReader,
+)
+
+requires_cryptography = pytest.mark.skipif(not CRYPTOGRAPHY_AVAILABLE, reason="cryptography is not installed")
+
+# compressible, and spanning several reader chunks at the small chunk sizes used below
+CONTENTS = b"".join(b"line %d, " % i + os.urandom(8) + b"\n" for i in range(5000))
+
+
+def _transform(data: bytes, stages: list, chunk_size: int = 4096) -> tuple[bytes, _TransformingReader]:
+    reader = _TransformingReader(BytesIO(data), stages, chunk_size=chunk_size)
+    out = BytesIO()
+    # read in pieces that don't line up with the source chunks, as boto3 does
+    while piece := reader.read(1000):
+        out.write(piece)
+    return out.getvalue(), reader
+
+
+class TestTransformingReader:
+    def test_no_stages(self):
+        stored, reader = _transform(CONTENTS, [])
+
+        assert stored == CONTENTS
+        assert reader.bytes_read == reader.bytes_written == len(CONTENTS)
+        assert not reader.seekable()
+
+    def test_gzip(self):
+        stored, reader = _transform(CONTENTS, [_GzipStage()])
+
+        assert gzip.decompress(stored) == CONTENTS
+        assert reader.bytes_read == len(CONTENTS)
+        assert reader.bytes_written == len(stored)
+        assert reader.bytes_written < reader.bytes_read
+
+    def test_read_all(self):
+        reader = _TransformingReader(BytesIO(CONTENTS), [_GzipStage()], chunk_size=4096)
+
+        stored = reader.read()
+
+        assert gzip.decompress(stored) == CONTENTS
+        assert reader.read() == b""
+        assert reader.bytes_written == len(stored)
+
+    def test_empty_source(self):
+        stored, reader = _transform(b"", [_GzipStage()])
+
+        assert gzip.decompress(stored) == b""
+        assert reader.bytes_read == 0
+        assert reader.bytes_written == len(stored)
+
+    @requires_cryptography
+    def test_aes(self):
+        key = secrets.token_bytes(32)
+        stored, reader = _transform(CONTENTS, [_AesGcmStage(key)])
+
+        # nonce + ciphertext + tag
+        assert reader.bytes_written == len(stored) == len(CONTENTS) + 12 + 16
+        assert MediaManager._decrypt_contents(BytesIO(stored), key).read() == CONTENTS
+
+    @requires_cryptography
+    def test_gzip_then_aes(self):
+        key = secrets.token_bytes(32)
+        stored, reader = _transform(CONTENTS, [_GzipStage(), _AesGcmStage(key)])
+
+        assert reader.bytes_read == len(CONTENTS)
+        assert reader.bytes_written == len(stored)
+        assert _gunzip(MediaManager._decrypt_contents(BytesIO(stored), key)).read() == CONTENTS
+
+
+@requires_cryptography
+class TestDecryptContents:
+    def test_reads_blobs_written_with_aesgcm(self):
+        # the layout previously written by `AESGCM.encrypt`, which stored media must keep decrypting
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+        key = secrets.token_bytes(32)
+        nonce = secrets.token_bytes(12)
+        stored = nonce + AESGCM(key).encrypt(nonce, CONTENTS, b"")
+
+        assert MediaManager._decrypt_contents(BytesIO(stored), key).read() == CONTENTS
+
+    def test_aesgcm_reads_streamed_blobs(self):
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+        key = secrets.token_bytes(32)
+        stored, _ = _transform(CONTENTS, [_AesGcmStage(key)])
+
+        assert AESGCM(key).decrypt(stored[:12], stored[12:], b"") == CONTENTS
+
+    def test_wrong_key_or_tampered_contents(self):
+        from cryptography.exceptions import InvalidTag
+
+        key = secrets.token_bytes(32)
+        stored, _ = _transform(CONTENTS, [_AesGcmStage(key)])
+
+        with pytest.raises(InvalidTag):
+            MediaManager._decrypt_contents(BytesIO(stored), secrets.token_bytes(32))
+        tampered = bytearray(stored)
+        tampered[100] ^= 1
+        with pytest.raises(InvalidTag):
+            MediaManager._decrypt_contents(BytesIO(bytes(tampered)), key)
+
+
+class TestGunzip:
+    @pytest.mark.parametrize("chunk_size", [7, 1024, 1024 * 1024])
+    def test_round_trip(self, chunk_size):
+        stored = gzip.compress(CONTENTS)
+
+        pieces = list(_iter_gunzip(BytesIO(stored), chunk_size=chunk_size))
+
+        assert b"".join(pieces) == CONTENTS
+        assert max(len(x) for x in pieces) <= chunk_size
+
+    def test_reads_files_written_by_gzipfile(self):
+        stored = BytesIO()
+        with gzip.GzipFile(fileobj=stored, mode="wb") as gz:
+            gz.write(CONTENTS)
+        stored.seek(0)
+
+        assert _gunzip(stored).read() == CONTENTS
+
+    @pytest.mark.parametrize("chunk_size", [7, 1024 * 1024])
+    def test_concatenated_members(self, chunk_size):
+        stored = gzip.compress(CONTENTS[:1000]) + gzip.compress(b"") + gzip.compress(CONTENTS[1000:])
+
+        assert b"".join(_iter_gunzip(BytesIO(stored), chunk_size=chunk_size)) == CONTENTS
+
+    def test_truncated(self):
+        stored = gzip.compress(CONTENTS)
+
+        with pytest.raises(EOFError):
+            _gunzip(BytesIO(stored[:-20]))
+
+
+class TestStoredMedia:
+    def test_sizes_follow_updates(self):
+        media = _stored_media(file_size_bytes=2000)
+        assert media.file_size == "2.0 kB"
+        assert media.preview_size == ""
+
+        updated = media.model_copy(update={"file_size_bytes": 5_000_000, "preview_size_bytes": 3000})
+        assert updated.file_size == "5.0 MB"
+        assert updated.model_dump()["preview_size"] == "3.0 kB"
+
+        media.file_size_bytes = 4000
+        assert media.file_size == "4.0 kB"
+
+
+def _stored_media(media_id: str = "20240101000000abcdef", **kwargs) -> StoredMedia:
+    return StoredMedia(
+        resource_id=media_id,
+        created_at="2024-01-01T00:00:00Z",
+        updated_at="2024-01-01T00:00:00Z",
+        media_type="image",
+        **kwargs,
+    )
+
+
+class StubMemory:
+    """Just enough of DynamoDbMemory for `retrieve_metadata`."""
+
+    def __init__(self, *items: StoredMedia):
+        self.items = {x.resource_id: x for x in items}
+        self.reads = 0
+
+    def read_existing(self, media_id: str, data_class):
+        self.reads += 1
+        return self.items[media_id]
+
+
+def _media_manager(memory: StubMemory, **kwargs) -> MediaManager:
+    return MediaManager("bucket", logging.getLogger(__name__), memory, s3_client=object(), **kwargs)
+
+
+class TestMetadataCache:
+    def test_off_by_default(self):
+        memory = StubMemory(_stored_media(file_size_bytes=1))
+        manager = _media_manager(memory)
+
+        manager.retrieve_metadata("20240101000000abcdef")
+        memory.items["20240101000000abcdef"] = _stored_media(file_size_bytes=2)
+
+        assert manager.retrieve_metadata("20240101000000abcdef").file_size_bytes == 2
+        assert memory.reads == 2
+
+    def test_ttl_expiry(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(media_manager.time, "monotonic", lambda: now[0])
+        memory = StubMemory(_stored_media(file_size_bytes=1))
+        manager = _media_manager(memory, metadata_cache_size=10, metadata_cache_ttl=60)
+
+        manager.retrieve_metadata("20240101000000abcdef")
+        memory.items["20240101000000abcdef"] = _stored_media(file_size_bytes=2)
+        now[0] += 59
+        assert manager.retrieve_metadata("20240101000000abcdef").file_size_bytes == 1
+        assert memory.reads == 1
+
+        now[0] += 2
+        assert manager.retrieve_metadata("20240101000000abcdef").file_size_bytes == 2
+        assert memory.reads == 2
+
+    def test_invalidate(self):
+        memory = StubMemory(_stored_media(file_size_bytes=1))
+        manager = _media_manager(memory, metadata_cache_size=10)
+
+        manager.retrieve_metadata("20240101000000abcdef")
+        memory.items["20240101000000abcdef"] = _stored_media(file_size_bytes=2)
+        assert manager.retrieve_metadata("20240101000000abcdef").file_size_bytes == 1
+
+        manager.invalidate("20240101000000abcdef")
+        assert manager.retrieve_metadata("20240101000000abcdef").file_size_bytes == 2
+        assert memory.reads == 2
+
+    def test_cached_items_are_copies(self):
+        memory = StubMemory(_stored_media(file_size_bytes=1))
+        manager = _media_manager(memory, metadata_cache_size=10)
+
+        manager.retrieve_metadata("20240101000000abcdef").file_size_bytes = 5
+
+        assert manager.retrieve_metadata("20240101000000abcdef").file_size_bytes == 1
+
+    def test_lru_eviction(self):
+        memory = StubMemory(*[_stored_media(f"20240101000000abcde{x}") for x in "abc"])
+        manager = _media_manager(memory, metadata_cache_size=2)
+
+        for media_id in ["20240101000000abcdea", "20240101000000abcdeb", "20240101000000abcdea"]:
+            manager.retrieve_metadata(media_id)
+        manager.retrieve_metadata("20240101000000abcdec")  # evicts "b", the least recently used
+        assert memory.reads == 3
+
+        manager.retrieve_metadata("20240101000000abcdea")
+        assert memory.reads == 3
+        manager.retrieve_metadata("20240101000000abcdeb")
+        assert memory.reads == 4
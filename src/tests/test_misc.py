@@ -0,0 +1,80 @@
+from io import BytesIO
+from string import ascii_lowercase
+
+import pandas as pd
+import pytest
+
+from supersullytools.utils import misc
+
+
+class UploadedFile(BytesIO):
+    def __init__(self, data: bytes, type: str):
+        super().__init__(data)
+        self.type = type
+
+
+CSV_WITH_MISSING_VALUES = b"a,b,zip\nNone,<NA>,00501\n,NA,02134\nx,,n/a\nNaN,null,\n"
+
+
+def _cells(data: pd.DataFrame) -> list[list]:
+    return data.astype(object).where(data.notna(), None).values.tolist()
+
+
+class TestLoadDataFromFile:
+    @pytest.mark.parametrize("replace_nan", [True, False])
+    def test_pyarrow_matches_pandas_fallback(self, replace_nan):
+        pytest.importorskip("pyarrow")
+        data = misc._read_delimited_with_pyarrow(BytesIO(CSV_WITH_MISSING_VALUES), ",", replace_nan)
+        assert data is not None
+
+        expected = pd.read_csv(BytesIO(CSV_WITH_MISSING_VALUES), dtype=str, low_memory=False)
+        assert data.isna().values.tolist() == expected.isna().values.tolist()
+        assert _cells(data) == _cells(expected)
+
+    def test_missing_values_and_leading_zeros(self):
+        data = misc.load_data_from_file(UploadedFile(CSV_WITH_MISSING_VALUES, "text/csv"))
+
+        assert data["a"].tolist() == [None, None, "x", None]
+        assert data["b"].tolist() == [None, None, None, None]
+        assert data["zip"].tolist() == ["00501", "02134", None, None]
+
+    def test_tsv(self):
+        data = misc.load_data_from_file(UploadedFile(b"a\tb\n01\t\n", "text/tab-separated-values"))
+
+        assert data.values.tolist() == [["01", None]]
+
+    def test_na_values_match_pandas(self):
+        # every marker is one `pd.read_csv` reads as missing
+        csv = "a\n" + "\n".join(f'"{x}"' for x in sorted(misc._PANDAS_NA_VALUES)) + "\n"
+        expected = pd.read_csv(BytesIO(csv.encode()), dtype=str, skip_blank_lines=False)
+        assert expected["a"].isna().all()
+        assert len(expected) == len(misc._PANDAS_NA_VALUES)
+        try:
+            from pandas._libs.parsers import STR_NA_VALUES
+        except ImportError:
+            return
+        assert misc._PANDAS_NA_VALUES == STR_NA_VALUES
+
+
+class TestDateId:
+    def test_format(self):
+        now = misc.now_with_dt()
+        ids = {misc.date_id(now) for _ in range(100)}
+
+        assert len(ids) == 100
+        for x in ids:
+            assert x[:14] == now.strftime("%Y%m%d%H%M%S")
+            assert len(x) == 20 and x[14:].isalpha() and x[14:].islower()
+
+    def test_suffix_letters_are_uniform(self):
+        # every byte that is kept maps to a letter, each letter from the same number of byte values
+        kept = bytes(range(256)).translate(misc._ID_SUFFIX_TABLE, misc._ID_SUFFIX_REJECTED)
+
+        assert len(kept) == 234
+        assert {kept.count(x) for x in ascii_lowercase.encode()} == {9}
+
+    def test_redraws_rejected_bytes(self, monkeypatch):
+        draws = iter([bytes([255] * 7 + [0]), bytes([250, 1, 2, 3, 4, 5, 6, 7])])
+        monkeypatch.setattr(misc.os, "urandom", lambda n: next(draws))
+
+        assert misc.date_id()[14:] == "abcdef"
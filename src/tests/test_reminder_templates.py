@@ -100,3 +100,17 @@ def test_days_until_partial():
     rendered = parse_template(template, reference_date=ref)
     # 2025-01-01 minus 2025-01-01 = 0
     assert rendered == "Days until partial date: 0"
+
+
+def test_offset_year_invalid():
+    reference_date = date(2025, 1, 1)
+    template = "Year {offset_year(abc)}"
+    rendered = parse_template(template, reference_date=reference_date)
+    assert rendered == "Year [Error: invalid offset 'abc']"
+
+
+def test_multiple_placeholders():
+    reference_date = date(2025, 1, 1)
+    template = "{ current_year } / {offset_year( -1 )} / {current_year()}"
+    rendered = parse_template(template, reference_date=reference_date)
+    assert rendered == "2025 / 2024 / [Unrecognized placeholder: current_year()]"